@@ -9,25 +9,13 @@ aggregate assignment data printed to the screen.
 import config
 import gradebook
 import grading
+import profiling
 
-def add_parser(subparsers):
-	parser = subparsers.add_parser('aggregate')
+def aggregate_data(args, categorized_gradebook=None):
 
-	parser.add_argument('-student', action='store_true', help='Flag to enable further statistics on a single student.')
-	parser.add_argument('-nowrite', action='store_true', help='Flag to disable generation of the aggregate file.')
-	parser.add_argument(
-		'-extrapolate',
-		dest='category',
-		default=None,
-		help='Flag to enable output columns of maximum minimum and expected grades. The average it taken from the supplied category.',
-	)
-
-	parser.set_defaults(func=aggregate_data)
-
-def aggregate_data(args):
-
-	# Aggregate all the scores to a single gradebook
-	categorized_gradebook = gradebook.get_categorized_gradebook()
+	# Aggregate all the scores to a single gradebook, unless already loaded
+	if categorized_gradebook is None:
+		categorized_gradebook = gradebook.get_categorized_gradebook()
 
 	if args.category and not args.category in categorized_gradebook:
 		print('Catetory "{}" is not in the gradebook.'.format(args.category))
@@ -45,6 +33,7 @@ def aggregate_data(args):
 	if args.student:
 		print_individual_student_scores(categorized_gradebook)
 
+@profiling.timed('output write')
 def write_student_scores(categorized_gradebook, extrapolate_category):
 	'''
 	Write out each student's score and letter grade to the configured file. If
@@ -62,10 +51,12 @@ def write_student_scores(categorized_gradebook, extrapolate_category):
 
 		writer = csv.writer(output)
 		writer.writerow(header)
-		for student in gradebook.get_active_students():
+		students = gradebook.get_active_students()
+		class_grades = grading.get_class_grades(categorized_gradebook, students)
+		for student in students:
 			data = [
 				student.name,
-				grading.calculate_semester_grade(student, categorized_gradebook)
+				class_grades.semester_grade(student)
 			]
 			if extrapolate_category:
 				data.extend(
@@ -85,17 +76,18 @@ def print_class_scores(categorized_gradebook):
 	across all students. This score is printed to the screen.
 	'''
 	students = gradebook.get_active_students()
+	class_grades = grading.get_class_grades(categorized_gradebook, students)
 
 	for category in categorized_gradebook:
 		print_class_category_scores(
-			students,
+			class_grades,
 			categorized_gradebook,
 			category
 		)
 	
-	print_class_average(students, categorized_gradebook)
+	print_class_average(class_grades)
 
-def print_class_category_scores(students, gradebook, category):
+def print_class_category_scores(class_grades, gradebook, category):
 	'''
 	Given a single category, present the assignments (alphabetized) and the
 	average class scores for each.
@@ -104,45 +96,16 @@ def print_class_category_scores(students, gradebook, category):
 	
 	for assignment in sorted(gradebook[category].keys()):
 		print('\t{:>6.2f}%  {}'.format(
-			100*get_assignment_average(
-				students,
-				gradebook,
-				category,
-				assignment
-				),
+			100*class_grades.assignment_average(category, assignment),
 			assignment,
 			)
 		)
 
-def get_assignment_average(students, gradebook, category, assignment):
-	'''
-	Calculate the average for all students on the particular assignment.
-	'''
-	value = 0.0
-	count = 0.0
-	for student in students:
-		value += grading.calculate_assignment_grade(
-			student,
-			gradebook,
-			category,
-			assignment
-		)
-		count += 1
-	
-	return value / count
-
-def print_class_average(students, categorized_gradebook):
+def print_class_average(class_grades):
 	'''
 	Calculate and print the average for the entire class.
 	'''
-	value = 0.0
-	count = 0.0
-
-	for student in students:
-		value += grading.calculate_semester_grade(student, categorized_gradebook)
-		count += 1
-
-	print('\nAverage {}'.format(100*value/count))
+	print('\nAverage {}'.format(100*class_grades.class_average()))
 
 def print_individual_student_scores(categorized_gradebook):
 
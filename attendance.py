@@ -0,0 +1,150 @@
+'''
+module attendance
+
+The record of student absences. AttendanceRecord.csv holds a row for each
+student, their id followed by the dates they were absent. New absences are not
+written into it directly: they are appended to a journal next to it (see
+csv_io.Journal), which is replayed when the record is loaded and folded back
+into the record file once it grows long enough.
+'''
+import config
+import csv_io
+import profiling
+
+import csv
+
+# Journal entries kept before they are folded into the record file
+COMPACT_ENTRIES = 200
+
+class AttendanceRecord(object):
+	'''
+	The absences of every student, indexed both ways:
+
+		by_student - maps student ids to the dates they were absent, as a
+		dictionary used as an ordered set
+		by_date - maps dates to the set of student ids absent on them
+	'''
+
+	def __init__(self, path):
+		self.path = path
+		self.journal = self.open_journal()
+		self.by_student = dict()
+		self.by_date = dict()
+		self.journal_entries = 0
+
+	def open_journal(self):
+		return csv_io.Journal(self.path + csv_io.JOURNAL_SUFFIX)
+
+	@profiling.timed('input read')
+	def load(self):
+		'''
+		Read the record file, then replay the journal over it.
+		'''
+		with csv_io.storage_lock:
+			with open(self.path, 'r') as f:
+				rows = [row for row in csv.reader(f) if row]
+			journal_rows = self.journal.read()
+
+		for row in rows:
+			student_id, dates = row[0], row[1:]
+			self.by_student.setdefault(student_id, dict())
+			for date in dates:
+				self.add(student_id, date)
+
+		for row in journal_rows:
+			if len(row) == 2:
+				self.add(*row)
+				self.journal_entries += 1
+
+		return self
+
+	def add(self, student_id, date):
+		'''
+		Mark the student absent on the date in memory. Returns whether they
+		were not marked already.
+		'''
+		dates = self.by_student.setdefault(student_id, dict())
+		if date in dates:
+			return False
+
+		dates[date] = None
+		self.by_date.setdefault(date, set()).add(student_id)
+
+		return True
+
+	def absences(self, student_id):
+		'''
+		The dates the student was absent, in the order they were recorded.
+		'''
+		return list(self.by_student.get(student_id, ()))
+
+	def absent_students(self, date):
+		return set(self.by_date.get(date, ()))
+
+	def date_recorded(self, date):
+		'''
+		Check if anyone has been marked absent on the date.
+		'''
+		return bool(self.by_date.get(date))
+
+	@profiling.timed('output write')
+	def record_absences(self, student_ids, date):
+		'''
+		Mark the students absent on the date and save the new absences.
+		'''
+		with csv_io.storage_lock:
+			new_ids = [student_id for student_id in student_ids if self.add(student_id, date)]
+			if new_ids:
+				self.save_absences(new_ids, date)
+
+	def save_absences(self, student_ids, date):
+		'''
+		Append the absences to the journal. Once the journal has
+		COMPACT_ENTRIES entries, it is folded into the record file in the
+		background.
+		'''
+		self.journal.append([[student_id, date] for student_id in student_ids])
+		self.journal_entries += len(student_ids)
+
+		if self.journal_entries >= COMPACT_ENTRIES:
+			self.journal.compact_in_background(self.path, self.to_rows)
+			self.journal_entries = 0
+
+	def to_rows(self):
+		return [[student_id] + list(dates) for student_id, dates in self.by_student.items()]
+
+class DatabaseAttendanceRecord(AttendanceRecord):
+	'''
+	The absences kept in the database instead of the record file. Each change
+	is committed to the database on its own, so it has no journal.
+	'''
+
+	def open_journal(self):
+		return None
+
+	@profiling.timed('input read')
+	def load(self):
+		import database
+
+		for student_id, date in database.load_absences():
+			self.add(student_id, date)
+
+		return self
+
+	def save_absences(self, student_ids, date):
+		import database
+
+		database.add_absences(student_ids, date)
+
+def load_attendance():
+	if config.STORAGE == 'sqlite':
+		return DatabaseAttendanceRecord(config.DATABASE_PATH).load()
+
+	return AttendanceRecord(config.ATTENDANCE_PATH).load()
+
+def clear_journal():
+	'''
+	Remove the journal of new absences, for when the record file itself is
+	replaced.
+	'''
+	csv_io.Journal(config.ATTENDANCE_PATH + csv_io.JOURNAL_SUFFIX).clear()
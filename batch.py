@@ -0,0 +1,276 @@
+'''
+module batch
+
+Runs aggregate, qca and report for many sections in one go, such as every
+section of a course at the end of a term. Each section is named by its
+config.ini, or by its directory, and a directory without a config.ini is taken
+to hold one section in each of its subdirectories.
+
+The sections are run in a pool of processes. Each section runs in the
+directory of its config.ini, as if the program had been started there, and
+what its subprograms print is written to BATCH_LOG_NAME in its output folder.
+A worker imports the program once and runs one section after another, so
+startup is paid once per worker rather than once per section. A summary of
+every section (students, average, QCA and letter grades) is written to a single
+csv file at the end. The gradebook of a section is loaded and graded once, and
+shared by its subprograms and its summary.
+'''
+import config
+import csv_io
+import gradebook
+import gradebook_cache
+import grading
+import subcommands
+
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import os
+
+BATCH_COMMANDS = ['aggregate', 'qca', 'report']
+CONFIG_NAME = 'config.ini'
+BATCH_LOG_NAME = 'BatchLog.txt'
+
+def run_batch(args):
+	'''
+	The entry point.
+	'''
+	config_paths = find_config_paths(args.sections)
+	if not config_paths:
+		print('No section configurations found.')
+		return
+
+	commands = args.commands or BATCH_COMMANDS
+	workers = get_worker_count(args.workers, config_paths)
+
+	print('Running {} for {} sections with {} workers'.format(
+		', '.join(commands),
+		len(config_paths),
+		workers,
+	))
+
+	summaries = []
+	failures = 0
+
+	for path, summary, error in run_sections(config_paths, workers, run_section, commands, gradebook_cache.ENABLED):
+		if error is not None:
+			failures += 1
+			continue
+
+		print('\t{}: {} students, QCA {}'.format(path, summary['Students'], summary['QCA']))
+		summaries.append(summary)
+
+	if summaries:
+		csv_io.write_dataset(args.summary, build_summary_rows(summaries))
+		print('Summary of {} sections written to {}'.format(len(summaries), args.summary))
+
+	if failures:
+		print('{} sections failed'.format(failures))
+
+def get_worker_count(requested, config_paths):
+	'''
+	The processes to use for the sections: the number requested, or one per
+	core, but never more than there are sections.
+	'''
+	return max(1, min(requested or os.cpu_count() or 1, len(config_paths)))
+
+def run_sections(config_paths, workers, function, *arguments):
+	'''
+	Call function(config_path, *arguments) for every section in a pool of
+	worker processes. Yields (config_path, result, error) for each section in
+	order, where error is the exception a failed section raised, after
+	printing it, and None otherwise. A section that exits, as the subprograms
+	do when they find a problem in the configuration, counts as failed rather
+	than stopping the rest.
+	'''
+	with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+		futures = [
+			executor.submit(function, path, *arguments)
+			for path in config_paths
+		]
+
+		for path, future in zip(config_paths, futures):
+			try:
+				result = future.result()
+			except (Exception, SystemExit) as e:
+				print('\t{}: failed, {}: {}'.format(path, type(e).__name__, e))
+				yield path, None, e
+			else:
+				yield path, result, None
+
+def find_config_paths(sections):
+	'''
+	Turn the section arguments into the absolute paths of their config.ini
+	files, in the order given and without repeats.
+	'''
+	config_paths = []
+
+	for section in sections:
+		if os.path.isdir(section):
+			candidate = os.path.join(section, CONFIG_NAME)
+			if os.path.isfile(candidate):
+				found = [candidate]
+			else:
+				found = [
+					os.path.join(section, name, CONFIG_NAME)
+					for name in sorted(os.listdir(section))
+					if os.path.isfile(os.path.join(section, name, CONFIG_NAME))
+				]
+		elif os.path.isfile(section):
+			found = [section]
+		else:
+			print('Skipping "{}", which is neither a configuration file nor a directory.'.format(section))
+			found = []
+
+		for path in found:
+			path = os.path.abspath(path)
+			if path not in config_paths:
+				config_paths.append(path)
+
+	return config_paths
+
+def load_section(config_path, use_cache=True):
+	'''
+	Put the configuration of a section into effect in this process, and move
+	into its directory.
+	'''
+	os.chdir(os.path.dirname(config_path))
+
+	if not use_cache:
+		gradebook_cache.disable()
+
+	config.load_configuration(config_path)
+
+def run_section(config_path, commands, use_cache=True):
+	'''
+	Run the subprograms for a single section in this process and summarize
+	its grades. The subprograms are all given the same gradebook, so it is
+	loaded and graded once. Runs in a worker of the pool.
+	'''
+	load_section(config_path, use_cache)
+
+	parser = argparse.ArgumentParser()
+	subcommands.add_parsers(parser.add_subparsers())
+
+	output = io.StringIO()
+	try:
+		with contextlib.redirect_stdout(output):
+			categorized_gradebook = gradebook.get_categorized_gradebook()
+
+			for command in commands:
+				print('== {}'.format(command))
+				command_args = parser.parse_args([command])
+				try:
+					subcommands.get_function(command_args)(command_args, categorized_gradebook)
+				except SystemExit:
+					raise RuntimeError('{} stopped, see {}'.format(command, get_log_path()))
+
+			summary = summarize_section(config_path, categorized_gradebook)
+	finally:
+		write_section_log(output.getvalue())
+
+	return summary
+
+def get_log_path():
+	return os.path.join(config.OUTPUT_DIR, BATCH_LOG_NAME)
+
+def write_section_log(text):
+	'''
+	Write what the section printed to its log. Failing to write it is only
+	reported, so it never hides the result or the error of the section.
+	'''
+	try:
+		with csv_io.atomic_writer(get_log_path()) as f:
+			f.write(text)
+	except OSError as e:
+		print('\tCould not write {}: {}'.format(get_log_path(), e))
+
+def summarize_section(config_path, categorized_gradebook):
+	'''
+	The number of active students of the loaded section, their average grade,
+	their QCA and how many of them have each letter grade. Students whose
+	grade reaches none of the cutoffs have no letter, and are counted as
+	ungraded and left out of the QCA.
+	'''
+	students = gradebook.get_active_students()
+	class_grades = grading.get_class_grades(categorized_gradebook, students)
+
+	letters = {letter: 0 for letter in config.QCA_VALUES}
+	ungraded = 0
+	grade_total = 0.0
+	qca_total = 0.0
+	for student in students:
+		grade_total += class_grades.semester_grade(student)
+		letter = class_grades.letter_grade(student)
+		if letter is None:
+			ungraded += 1
+			continue
+
+		letters[letter] = letters.get(letter, 0) + 1
+		qca_total += config.QCA_VALUES.get(letter, 0.0)
+
+	summary = {
+		'Section': os.path.basename(os.path.dirname(config_path)),
+		'Configuration': config_path,
+		'Students': len(students),
+		'Ungraded': ungraded,
+		'Letters': letters,
+		'Grade Total': grade_total,
+		'QCA Total': qca_total,
+	}
+	set_averages(summary)
+
+	return summary
+
+def set_averages(summary):
+	'''
+	Fill in the average grade and QCA of a summary from its totals.
+	'''
+	students = summary['Students']
+	graded = students - summary['Ungraded']
+
+	summary['Average'] = summary['Grade Total'] / students if students else ''
+	summary['QCA'] = round(summary['QCA Total'] / graded, 3) if graded else ''
+
+def build_summary_rows(summaries):
+	'''
+	A row for each section and one for all of them together, with a column
+	for each letter grade given in any section.
+	'''
+	letters = []
+	for summary in summaries:
+		for letter in sorted(summary['Letters']):
+			if letter not in letters:
+				letters.append(letter)
+
+	total = {
+		'Section': 'All sections',
+		'Configuration': '',
+		'Students': sum(summary['Students'] for summary in summaries),
+		'Ungraded': sum(summary['Ungraded'] for summary in summaries),
+		'Letters': dict(),
+		'Grade Total': sum(summary['Grade Total'] for summary in summaries),
+		'QCA Total': sum(summary['QCA Total'] for summary in summaries),
+	}
+	for summary in summaries:
+		for letter, count in summary['Letters'].items():
+			total['Letters'][letter] = total['Letters'].get(letter, 0) + count
+
+	set_averages(total)
+
+	rows = []
+	for summary in summaries + [total]:
+		row = {
+			'Section': summary['Section'],
+			'Configuration': summary['Configuration'],
+			'Students': summary['Students'],
+			'Average': summary['Average'],
+			'QCA': summary['QCA'],
+		}
+		for letter in letters:
+			row[letter] = summary['Letters'].get(letter, 0)
+		row['Ungraded'] = summary['Ungraded']
+		rows.append(row)
+
+	return rows
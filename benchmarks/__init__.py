@@ -0,0 +1,11 @@
+'''
+package benchmarks
+
+Times the gradebook subcommands against synthetic courses. Run it from the
+repository root with
+
+	python3 -m benchmarks
+
+and every run is added to a JSON history so that runs from different commits
+can be compared.
+'''
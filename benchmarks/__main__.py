@@ -0,0 +1,209 @@
+'''
+Time each subcommand against a synthetic course and record the results.
+
+Every subcommand is run as its own program.py process, as it would be from the
+shell, so the times include starting up and loading the configuration. The
+first repetition of each starts without a gradebook cache.
+'''
+import os
+import sys
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from benchmarks import synthetic
+
+import csv_io
+
+import argparse
+import datetime
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+PROGRAM = os.path.join(REPOSITORY, 'program.py')
+DEFAULT_HISTORY = os.path.join(REPOSITORY, 'benchmarks', 'history.json')
+
+'''
+The subcommands to time and the input they are given.
+'''
+SUBCOMMANDS = [
+	('aggregate', ['aggregate'], ''),
+	('qca', ['qca', '-verbose'], ''),
+	('report', ['report'], ''),
+	('generate canvas', ['generate', 'canvas'], ''),
+	('generate all', ['generate', 'all'], ''),
+	('update', ['update'], 'y\n'),
+]
+
+def parse_arguments():
+	parser = argparse.ArgumentParser(prog='python3 -m benchmarks')
+
+	parser.add_argument('-students', type=int, default=200)
+	parser.add_argument('-categories', type=int, default=3, help='Local grade categories, WebAssign not included.')
+	parser.add_argument('-assignments', type=int, default=20, help='Assignments in each equally scored category.')
+	parser.add_argument('-webassign', type=int, default=30, help='Assignment columns in the WebAssign export.')
+	parser.add_argument('-attendance', type=int, default=40, help='Class days in the attendance record.')
+	parser.add_argument('-repeat', type=int, default=3)
+	parser.add_argument('-only', action='append', default=None, help='Only time this subcommand. May be repeated.')
+	parser.add_argument('-history', default=DEFAULT_HISTORY)
+	parser.add_argument('-label', default='', help='A note stored with the results.')
+	parser.add_argument('-keep', action='store_true', help='Keep the synthetic course directory.')
+
+	return parser.parse_args()
+
+def main():
+	args = parse_arguments()
+	size = synthetic.CourseSize(
+		students=args.students,
+		categories=args.categories,
+		assignments=args.assignments,
+		webassign=args.webassign,
+		attendance=args.attendance,
+	)
+
+	base = tempfile.mkdtemp(prefix='gradebook-benchmark-')
+	try:
+		config_path = synthetic.generate_course(base, size)
+		results = time_subcommands(base, config_path, args.repeat, args.only)
+	finally:
+		if args.keep:
+			print('Synthetic course kept in {}'.format(base))
+		else:
+			shutil.rmtree(base)
+
+	entry = {
+		'date': datetime.datetime.now().isoformat(timespec='seconds'),
+		'commit': get_commit(),
+		'label': args.label,
+		'size': size.to_dictionary(),
+		'repeat': args.repeat,
+		'results': results,
+	}
+
+	history = load_history(args.history)
+	print_results(entry, find_previous(history, entry))
+	history.append(entry)
+	save_history(args.history, history)
+
+def time_subcommands(base, config_path, repeat, only):
+	'''
+	Run each subcommand repeat times and collect the wall clock times in
+	seconds.
+	'''
+	environment = dict(os.environ)
+	environment['GRADEBOOK_CONFIG'] = config_path
+
+	roster_path = os.path.join(base, 'data', 'ClassRoster.csv')
+	roster_journal = csv_io.Journal(roster_path + csv_io.JOURNAL_SUFFIX)
+	pristine_roster = roster_path + '.pristine'
+	shutil.copyfile(roster_path, pristine_roster)
+
+	results = dict()
+
+	for name, arguments, stdin in SUBCOMMANDS:
+		if only and name not in only:
+			continue
+
+		subprocess.run(
+			[sys.executable, PROGRAM, 'cache', 'clear'],
+			cwd=base, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+			check=True,
+		)
+
+		times = []
+		for _ in range(repeat):
+			# Updating changes the roster, so every run starts from the same one
+			shutil.copyfile(pristine_roster, roster_path)
+			roster_journal.clear()
+
+			start = time.perf_counter()
+			completed = subprocess.run(
+				[sys.executable, PROGRAM] + arguments,
+				cwd=base, env=environment, input=stdin, universal_newlines=True,
+				stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+			)
+			times.append(time.perf_counter() - start)
+
+			if completed.returncode != 0:
+				raise RuntimeError('"{}" failed:\n{}'.format(name, completed.stderr))
+
+		shutil.copyfile(pristine_roster, roster_path)
+		roster_journal.clear()
+
+		results[name] = {
+			'times': times,
+			'first': times[0],
+			'best': min(times),
+			'median': statistics.median(times),
+		}
+
+	return results
+
+def get_commit():
+	'''
+	The commit being benchmarked, marked dirty if there are local changes.
+	'''
+	try:
+		commit = subprocess.check_output(
+			['git', 'rev-parse', '--short', 'HEAD'],
+			cwd=REPOSITORY, stderr=subprocess.DEVNULL, universal_newlines=True,
+		).strip()
+		status = subprocess.check_output(
+			['git', 'status', '--porcelain', '--untracked-files=no'],
+			cwd=REPOSITORY, stderr=subprocess.DEVNULL, universal_newlines=True,
+		)
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+	if status.strip():
+		commit += '-dirty'
+
+	return commit
+
+def load_history(path):
+	if not os.path.exists(path):
+		return []
+
+	with open(path, 'r') as f:
+		return json.load(f)
+
+def save_history(path, history):
+	with open(path, 'w') as f:
+		json.dump(history, f, indent='\t')
+
+def find_previous(history, entry):
+	'''
+	The most recent recorded run of the same course size, if any.
+	'''
+	for previous in reversed(history):
+		if previous['size'] == entry['size']:
+			return previous
+
+	return None
+
+def print_results(entry, previous):
+	print('Commit {}, {} students'.format(entry['commit'], entry['size']['students']))
+	if previous is not None:
+		print('Compared with commit {} from {}'.format(previous['commit'], previous['date']))
+
+	print('{:<16} {:>9} {:>9} {:>9} {:>8}'.format('Subcommand', 'First', 'Best', 'Median', 'Change'))
+	for name, result in entry['results'].items():
+		change = ''
+		if previous is not None and name in previous['results']:
+			before = previous['results'][name]['median']
+			change = '{:+.1%}'.format((result['median'] - before) / before)
+
+		print('{:<16} {:>8.3f}s {:>8.3f}s {:>8.3f}s {:>8}'.format(
+			name,
+			result['first'],
+			result['best'],
+			result['median'],
+			change,
+		))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,233 @@
+'''
+module synthetic
+
+Generates a made up course laid out like example/config.ini: a roster and
+attendance record in the data folder, a folder of graded items for each
+category, and the WebAssign, Canvas and HokieSpa files in the input folder.
+'''
+import config
+
+import csv
+import datetime
+import os
+import random
+
+ROSTER_KEYS = ['Student ID', 'First Name', 'Last Name', 'Email', 'Preferred Name', 'Year', 'Status', 'Major']
+
+class CourseSize(object):
+	'''
+	The amount of everything in a synthetic course.
+	'''
+
+	def __init__(self, students=200, categories=3, assignments=20, webassign=30, attendance=40):
+		self.students = students
+		self.categories = categories
+		self.assignments = assignments
+		self.webassign = webassign
+		self.attendance = attendance
+
+	def to_dictionary(self):
+		return dict(self.__dict__)
+
+def generate_course(base, size, seed=0):
+	'''
+	Write a synthetic course into the base directory and return the path of
+	its config.ini.
+	'''
+	generator = random.Random(seed)
+
+	for folder in ['data', 'grades', 'input', 'output', 'generated']:
+		os.makedirs(os.path.join(base, folder), exist_ok=True)
+
+	students = make_students(size.students)
+	write_roster(os.path.join(base, 'data', 'ClassRoster.csv'), students)
+	write_attendance(os.path.join(base, 'data', 'AttendanceRecord.csv'), students, size.attendance, generator)
+
+	assignments = []
+	for category, items in choose_categories(size):
+		os.makedirs(os.path.join(base, 'grades', category), exist_ok=True)
+		for name, points in items:
+			path = os.path.join(base, 'grades', category, '{}.csv'.format(name))
+			write_graded_item(path, students, points, generator)
+			assignments.append(name)
+
+	webassign = ['WebAssign {}'.format(i + 1) for i in range(size.webassign)]
+	write_webassign(os.path.join(base, 'input', 'WAScores.csv'), students, webassign, generator)
+	write_canvas(os.path.join(base, 'input', 'canvas.csv'), students, assignments + webassign)
+	write_hokiespa(os.path.join(base, 'input', 'hokiespa_roster.csv'), students, generator)
+
+	return write_config(base)
+
+def choose_categories(size):
+	'''
+	Pick local categories from the default grade weights, which are the ones
+	example/config.ini configures. Categories scored equally get the requested
+	number of assignments, while the others get the assignments configured for
+	them. WebAssign comes from its own file.
+	'''
+	chosen = []
+
+	for category, weights in config.DEFAULT_GRADE_WEIGHTS.items():
+		if category == 'WebAssign' or len(chosen) == size.categories:
+			continue
+
+		if 'equally_scored' in weights:
+			items = [
+				('{} {}'.format(category.title(), i + 1), weights['equally_scored'])
+				for i in range(size.assignments)
+			]
+		else:
+			items = [
+				(name, points) for name, points in weights.items()
+				if name not in ['weight', 'drops', 'keep', 'minimum']
+			]
+
+		chosen.append((category, items))
+
+	return chosen
+
+def make_students(count):
+	students = []
+
+	for i in range(count):
+		students.append({
+			'Student ID': '9{:08d}'.format(i),
+			'First Name': 'First{}'.format(i),
+			'Last Name': 'Last{}'.format(i % 97),
+			'Email': 'pid{}@vt.edu'.format(i),
+			'Preferred Name': '',
+			'Year': 'Sophomore',
+			'Status': 'Active',
+			'Major': 'MATH',
+		})
+
+	return students
+
+def write_roster(path, students):
+	with open(path, 'w') as f:
+		writer = csv.DictWriter(f, ROSTER_KEYS)
+		writer.writeheader()
+		writer.writerows(students)
+
+def write_attendance(path, students, days, generator):
+	start = datetime.date(2017, 8, 21)
+	dates = [(start + datetime.timedelta(days=2 * i)).isoformat() for i in range(days)]
+
+	with open(path, 'w') as f:
+		writer = csv.writer(f)
+		for student in students:
+			absences = [d for d in dates if generator.random() < 0.05]
+			if absences:
+				writer.writerow([student['Student ID']] + absences)
+
+def random_score(points, generator):
+	if generator.random() < 0.05:
+		return ''
+
+	return str(generator.randint(0, int(points)))
+
+def write_graded_item(path, students, points, generator):
+	with open(path, 'w') as f:
+		writer = csv.writer(f)
+		writer.writerow(['Student ID', 'Name', 'Score'])
+		for student in students:
+			writer.writerow([
+				student['Student ID'],
+				'{}, {}'.format(student['Last Name'], student['First Name']),
+				random_score(points, generator),
+			])
+
+def write_webassign(path, students, assignments, generator):
+	'''
+	Imitate the WebAssign export: four rows about the class, the assignment
+	names and points, three more rows, then a row of scores per student.
+	'''
+	with open(path, 'w') as f:
+		writer = csv.writer(f)
+		writer.writerow(['Synthetic Course'])
+		writer.writerow(['Instructor'])
+		writer.writerow(['Section'])
+		writer.writerow(['Downloaded'])
+		writer.writerow([''] * 5 + assignments)
+		writer.writerow([''] * 5 + ['20'] * len(assignments))
+		writer.writerow([])
+		writer.writerow(['Scores'])
+		writer.writerow(['Fullname', 'Username', 'Student ID', '', 'Total'])
+		for student in students:
+			username = student['Email'].split('@')[0] + '@vt'
+			scores = [
+				'NS' if generator.random() < 0.05 else str(generator.randint(0, 20))
+				for _ in assignments
+			]
+			writer.writerow([student['First Name'], username, '', '', ''] + scores)
+
+def write_canvas(path, students, assignments):
+	'''
+	Imitate a Canvas gradebook download, with an id in each assignment header.
+	'''
+	headers = ['{} ({})'.format(name, 100000 + i) for i, name in enumerate(assignments)]
+
+	with open(path, 'w') as f:
+		writer = csv.writer(f)
+		writer.writerow(['Student', 'ID', 'SIS User ID', 'SIS Login ID', 'Section'] + headers)
+		writer.writerow(['Points Possible', '', '', '', ''] + ['20'] * len(headers))
+		for i, student in enumerate(students):
+			writer.writerow([
+				'{}, {}'.format(student['Last Name'], student['First Name']),
+				str(500000 + i),
+				student['Student ID'],
+				student['Email'].split('@')[0],
+				'Section',
+			] + [''] * len(headers))
+
+def write_hokiespa(path, students, generator):
+	'''
+	Write a HokieSpa roster where a few students dropped and a few joined, so
+	updating the roster has work to do.
+	'''
+	with open(path, 'w') as f:
+		writer = csv.writer(f)
+		for student in students:
+			if generator.random() < 0.02:
+				continue
+			writer.writerow([
+				student['Student ID'],
+				'Enrolled',
+				'A-F',
+				student['Last Name'],
+				student['First Name'],
+				student['Preferred Name'],
+				student['Major'],
+				student['Year'],
+				student['Email'],
+				'',
+			])
+		for i in range(max(1, len(students) // 50)):
+			writer.writerow([
+				'8{:08d}'.format(i),
+				'Enrolled',
+				'A-F',
+				'New{}'.format(i),
+				'Student',
+				'',
+				'MATH',
+				'Freshman',
+				'new{}@vt.edu'.format(i),
+				'',
+			])
+
+def write_config(base):
+	'''
+	Copy the example configuration, pointed at the base directory.
+	'''
+	with open(config.EXAMPLE_CONFIG_FILE, 'r') as f:
+		lines = f.readlines()
+
+	path = os.path.join(base, 'config.ini')
+	with open(path, 'w') as f:
+		for line in lines:
+			if line.startswith('Base ='):
+				line = 'Base = {}\n'.format(base)
+			f.write(line)
+
+	return path
@@ -2,21 +2,20 @@ import config
 import gradebook
 import grading
 
-def add_parser(subparsers):
-	parser = subparsers.add_parser('qca')
-	parser.add_argument('-verbose', action='store_true', default=False)
-	parser.set_defaults(func=calculate_class_qca)
-
-def calculate_class_qca(args):
+def calculate_class_qca(args, student_grades=None):
 	print('Working on it.')
-	student_grades = gradebook.get_categorized_gradebook()
+	if student_grades is None:
+		student_grades = gradebook.get_categorized_gradebook()
 
 	grades = []
 	letter_grades = []
 
-	for student in gradebook.get_active_students():
-		grade = grading.calculate_semester_grade(student, student_grades)
-		letter = grading.calculate_student_letter_grade(student, student_grades)
+	students = gradebook.get_active_students()
+	class_grades = grading.get_class_grades(student_grades, students)
+
+	for student in students:
+		grade = class_grades.semester_grade(student)
+		letter = class_grades.letter_grade(student)
 		grades.append(grade)
 		letter_grades.append(letter)
 	
@@ -1,21 +1,79 @@
+import collections
 import configparser
+import json
 import logging
 import os
 import os.path
+import profiling
+import types
 
 ENVIRONMENT_CONFIG_VARIABLE = 'GRADEBOOK_CONFIG'
 DEFAULT_CONFIG_PATH = './config.ini'
 EXAMPLE_CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'example', 'config.ini')
 
-def load_configuration():
+COMPILED_VERSION = 4
+
+'''
+The settings in effect, as read from a configuration file: its path and a
+read only mapping from setting names (ROSTER_PATH, GRADES_DIR, WORKERS, ...)
+to their values.
+'''
+Configuration = collections.namedtuple('Configuration', ['source', 'settings'])
+
+_configuration = None
+
+def __getattr__(name):
+	'''
+	The settings read from the configuration file (the *_PATH and *_DIR
+	values, WORKERS, ...) are looked up in the loaded Configuration. Asking for
+	one of them loads the configuration, so it is only read and verified by
+	programs that actually need it.
+	'''
+	if name.isupper():
+		settings = get_configuration().settings
+		if name in settings:
+			return settings[name]
+
+	raise AttributeError('module {} has no attribute {}'.format(__name__, name))
+
+def get_configuration():
+	'''
+	Get the Configuration in effect, loading it if needed.
+	'''
+	if _configuration is None:
+		load_configuration()
+
+	return _configuration
+
+@profiling.timed('config load')
+def load_configuration(config_path=None):
+	'''
+	Load the configuration file, found with get_config_path() unless a path is
+	given, and put it into effect. The verified and resolved settings are kept
+	in a compiled file next to the configuration file, which is read instead
+	as long as neither configuration file has changed.
+	'''
+	global _configuration
+
 	logging.basicConfig(level='DEBUG')
 
-	config_path = get_config_path()
-	configuration = load_configuration_from_file(config_path)
-	verify_configuration(configuration)
+	if config_path is None:
+		config_path = get_config_path()
+
+	settings = load_compiled_settings(config_path)
+
+	if settings is None:
+		configuration = load_configuration_from_file(config_path)
+		verify_configuration(configuration)
+		settings = compile_settings(configuration)
+		settings.update(compile_grading_settings(config_path))
+		save_compiled_settings(config_path, settings)
 
-	set_log_configuration(configuration)
-	apply_configuration_to_globals(configuration)
+	set_log_configuration(settings['LOG_LEVEL'])
+
+	_configuration = Configuration(config_path, types.MappingProxyType(settings))
+
+	return _configuration
 
 def load_configuration_from_file(path):
 	configuration = configparser.ConfigParser(
@@ -47,12 +105,7 @@ def verify_configuration(configuration):
 				logging.error('Missing {} entry "{}"'.format(section, key))
 		raise KeyError('Configuration missing entries. Please fix the errors.')
 
-def set_log_configuration(configuration):
-	log_level = configuration['General'].get('log level', None)
-
-	if log_level is None:
-		log_level = 'INFO'
-	
+def set_log_configuration(log_level):
 	logging.debug('Setting log level to {}'.format(log_level))
 	
 	logging.basicConfig(level=log_level)
@@ -77,7 +130,12 @@ def get_config_path():
 	
 	return config_path
 
-def apply_configuration_to_globals(configuration):
+def compile_settings(configuration):
+	'''
+	Resolve a verified configuration into a dictionary of settings.
+	'''
+	settings = dict()
+
 	base = configuration['Directory']['Base']
 	paths = configuration['Paths']
 	dirs = configuration['Directory']
@@ -87,22 +145,169 @@ def apply_configuration_to_globals(configuration):
 		new_path = os.path.join(base, new_path)
 		new_path = os.path.abspath(new_path)
 		path_name = '{}_PATH'.format(path_name)
-		globals()[path_name.upper()] = new_path
+		settings[path_name.upper()] = new_path
 	
 	for dir_name in dirs:
 		new_dir = dirs[dir_name]
 		new_dir = os.path.join(base, new_dir)
 		new_dir = os.path.abspath(new_dir)
 		dir_name = '{}_DIR'.format(dir_name.upper())
-		globals()[dir_name] = new_dir
-	
+		settings[dir_name] = new_dir
+
+	settings['LOG_LEVEL'] = configuration['General'].get('log level', 'INFO')
+
+	# The number of processes used to parse the grade files. With one worker,
+	# the files are parsed one after the other.
+	settings['WORKERS'] = configuration['General'].getint('workers', 1)
+
+	# Where the roster, attendance and local grades are kept: in the csv files
+	# of the data and grades folders, or in a SQLite database in the data
+	# folder.
+	settings['STORAGE'] = configuration['General'].get('storage', 'csv')
+	if settings['STORAGE'] not in STORAGE_BACKENDS:
+		logging.error('Unknown storage "{}", expected one of {}'.format(settings['STORAGE'], STORAGE_BACKENDS))
+		raise KeyError('Configuration has an invalid storage. Please fix the errors.')
+
+	settings['DATABASE_PATH'] = os.path.join(
+		settings['DATA_DIR'],
+		configuration['General'].get('database', 'Gradebook.sqlite3')
+	)
+
+	return settings
+
+def compile_grading_settings(config_path):
+	'''
+	Read the grading policy from the configuration file. Each category has a
+	section named "Category <name>" holding its weight, the optional
+	"equally scored", drops, keep and minimum entries, and the points of each
+	assignment otherwise. The letter grades are given in the "Grade Cutoffs"
+	and "QCA Values" sections. Each category and each QCA value left out keeps
+	its default below, while a configured category replaces its default
+	whole. The cutoffs form one scale, so they are either all configured or
+	all left to the default.
+	'''
+	# Assignment names and letters are case sensitive, unlike other keys
+	configuration = configparser.ConfigParser(interpolation=None)
+	configuration.optionxform = str
+	configuration.read(config_path)
+
+	weights = {category: dict(settings) for category, settings in DEFAULT_GRADE_WEIGHTS.items()}
+	for section in configuration.sections():
+		if section.startswith(CATEGORY_SECTION_PREFIX):
+			category = section[len(CATEGORY_SECTION_PREFIX):].strip()
+			weights[category] = compile_category(configuration[section])
+
+	cutoffs = DEFAULT_GRADE_CUTOFFS
+	if configuration.has_section('Grade Cutoffs'):
+		cutoffs = [
+			(letter, float(score))
+			for letter, score in configuration['Grade Cutoffs'].items()
+		]
+		cutoffs.sort(key=lambda cutoff: cutoff[1], reverse=True)
+
+	qca_values = dict(DEFAULT_QCA_VALUES)
+	if configuration.has_section('QCA Values'):
+		for letter, value in configuration['QCA Values'].items():
+			qca_values[letter] = float(value)
+
+	return {
+		'GRADE_WEIGHTS': weights,
+		'GRADE_CUTOFFS': cutoffs,
+		'QCA_VALUES': qca_values,
+	}
+
+def compile_category(section):
+	'''
+	Turn a category section into an entry of GRADE_WEIGHTS.
+	'''
+	category = dict()
+
+	for key, value in section.items():
+		name = key.lower()
+		if name == 'weight':
+			category['weight'] = float(value)
+		elif name == 'equally scored':
+			category['equally_scored'] = float(value)
+		elif name in ['drops', 'keep', 'minimum']:
+			category[name] = int(value)
+		else:
+			category[key] = float(value)
+
+	return category
+
+def get_compiled_path(config_path):
+	directory, name = os.path.split(config_path)
+	return os.path.join(directory, '.{}.compiled'.format(name))
+
+def get_compiled_key(config_path):
+	'''
+	Everything the compiled settings depend on: both configuration files, this
+	module, which holds the default grading policy, and, since relative paths
+	are resolved against it, the working directory.
+	'''
+	key = [config_path, os.getcwd()]
+
+	for path in [config_path, EXAMPLE_CONFIG_FILE, __file__]:
+		stat = os.stat(path)
+		key.extend([stat.st_size, stat.st_mtime_ns])
+
+	return key
+
+def load_compiled_settings(config_path):
+	'''
+	Read the compiled settings of the configuration file, or None if they are
+	missing or out of date.
+	'''
+	try:
+		with open(get_compiled_path(config_path), 'r') as f:
+			compiled = json.load(f)
+	except (OSError, ValueError):
+		return None
+
+	if compiled.get('version') != COMPILED_VERSION:
+		return None
+	if compiled.get('key') != get_compiled_key(config_path):
+		return None
+
+	return compiled['settings']
+
+def save_compiled_settings(config_path, settings):
+	'''
+	Save the compiled settings for the next run. Failing to save them only
+	means the configuration is read again next time.
+	'''
+	compiled = {
+		'version': COMPILED_VERSION,
+		'key': get_compiled_key(config_path),
+		'settings': settings,
+	}
+
+	try:
+		with open(get_compiled_path(config_path), 'w') as f:
+			json.dump(compiled, f)
+	except OSError:
+		logging.debug('Unable to save the compiled configuration')
+
+# Default grading policy, used when the configuration file does not give one.
+# The policy in effect is available as config.GRADE_WEIGHTS,
+# config.GRADE_CUTOFFS and config.QCA_VALUES.
+
+STORAGE_BACKENDS = ['csv', 'sqlite']
+
+CATEGORY_SECTION_PREFIX = 'Category '
+
 # Grade weights
 # the format for a weight entry should be 
 
 # weight[category][assignment] = points
 # weight[categeory]['weight'] = category weight
 
-GRADE_WEIGHTS = {
+# A category may also choose which of a student's scores are counted:
+# weight[category]['drops'] = number of lowest scores to drop
+# weight[category]['keep'] = number of best scores to count
+# weight[category]['minimum'] = fewest scores to count (1 if not given)
+
+DEFAULT_GRADE_WEIGHTS = {
 	'homework': {
 		'equally_scored': 10.0,
 		'weight': 0.15,
@@ -126,7 +331,7 @@ GRADE_WEIGHTS = {
 	},
 }
 
-QCA_VALUES = {
+DEFAULT_QCA_VALUES = {
 	'A':  4.0,
 	'A-': 3.7,
 	'B+': 3.3,
@@ -141,7 +346,7 @@ QCA_VALUES = {
 	'F':  0.0,
 }
 
-GRADE_CUTOFFS = [
+DEFAULT_GRADE_CUTOFFS = [
 	('A',  0.92),
 	('A-', 0.90),
 	('B+', 0.87),
@@ -4,9 +4,130 @@ module csv_io
 The gradebook program interacts with WebAssign, Canvas, and the user primarily
 through CSV files. This module handles the interpretation of CSV files as
 Python objects used by the gradebook and vice versa.
+
+Files are replaced with atomic_writer, so a write that is interrupted leaves
+the previous file in place. Records that change a little at a time, like the
+roster and the attendance record, append their changes to a Journal next to
+them instead, which is folded back into the record once it grows long enough.
 '''
+import contextlib
 import csv
+import os
+import profiling
+import threading
+
+JOURNAL_SUFFIX = '.journal'
+
+# Large enough that most files are written with a single system call
+WRITE_BUFFER_SIZE = 1 << 20
+
+'''
+Held while a record and its journal are read, appended to or compacted, so that
+a record is never read between being rewritten and having its journal emptied.
+'''
+storage_lock = threading.RLock()
+
+@contextlib.contextmanager
+def atomic_writer(path):
+	'''
+	Open a file that replaces the file at path once it is closed. Everything
+	is written through a large buffer to a temporary file, which is renamed
+	over path only once it is complete.
+	'''
+	temporary_path = path + '.tmp'
+
+	try:
+		with open(temporary_path, 'w', buffering=WRITE_BUFFER_SIZE) as f:
+			yield f
+			f.flush()
+			os.fsync(f.fileno())
+	except BaseException:
+		with contextlib.suppress(FileNotFoundError):
+			os.remove(temporary_path)
+		raise
+
+	os.replace(temporary_path, path)
+
+def write_rows(path, rows):
+	'''
+	Replace the file at path with the rows.
+	'''
+	with atomic_writer(path) as f:
+		csv.writer(f).writerows(rows)
+
+class Journal(object):
+	'''
+	An append-only CSV file of the changes made to a record since it was last
+	written in full. Changes are synced to disk as they are appended, replayed
+	over the record when it is loaded, and dropped when the record is
+	compacted. Appending and compacting both hold storage_lock, so no change
+	is appended between the record being rewritten and the journal being
+	emptied.
+	'''
+
+	def __init__(self, path):
+		self.path = path
+
+	def signature(self):
+		'''
+		The size and modification time of the journal, or None if it is empty.
+		'''
+		try:
+			stat = os.stat(self.path)
+		except FileNotFoundError:
+			return None
+
+		return (stat.st_size, stat.st_mtime_ns)
+
+	def read(self):
+		'''
+		The rows appended since the last compaction.
+		'''
+		try:
+			with open(self.path, 'r') as f:
+				return [row for row in csv.reader(f) if row]
+		except FileNotFoundError:
+			return []
+
+	def append(self, rows):
+		with storage_lock:
+			with open(self.path, 'a') as f:
+				csv.writer(f).writerows(rows)
+				f.flush()
+				os.fsync(f.fileno())
+
+		profiling.count('journal entries', len(rows))
 
+	def clear(self):
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+	@profiling.timed('output write')
+	def compact(self, record_path, rows):
+		'''
+		Replace the record with rows holding every change, then empty the
+		journal.
+		'''
+		with storage_lock:
+			write_rows(record_path, rows)
+			self.clear()
+
+	def compact_in_background(self, record_path, get_rows):
+		'''
+		Compact on a separate thread. The rows of the record are taken from
+		get_rows once storage_lock is held, so they include every change
+		appended before. The program waits for it to finish before exiting.
+		'''
+		def compact():
+			with storage_lock:
+				self.compact(record_path, get_rows())
+
+		thread = threading.Thread(target=compact)
+		thread.start()
+
+		return thread
+
+@profiling.timed('output write')
 def write_dataset(filename, dataset):
 	'''
 	Write the given dataset to the specified filename as a tab delimited CSV
@@ -16,17 +137,21 @@ def write_dataset(filename, dataset):
 	dataset - an iterable of dictionaries, where the keys are the CSV headers
 	'''
 	
-	headers = None
-
-	for row in dataset:
-		headers = row.keys()
-		break
+	rows = iter(dataset)
+	first = next(rows, None)
+	headers = None if first is None else first.keys()
 	
-	with open(filename, 'w') as csv_file:
+	with atomic_writer(filename) as csv_file:
 		writer = csv.DictWriter(csv_file, headers)
 		writer.writeheader()
-		writer.writerows(dataset)
+		if first is not None:
+			writer.writerow(first)
+			writer.writerows(rows)
+
+	if profiling.ENABLED and hasattr(dataset, '__len__'):
+		profiling.count('output rows', len(dataset))
 
+@profiling.timed('input read')
 def load_csv_as_dict(filename):
 	'''
 	Load the CSV. For each row, let the first entry be the key and the
@@ -0,0 +1,322 @@
+'''
+module database
+
+An optional SQLite store for the roster, the attendance record and the local
+grades, used in place of the csv files when config.ini sets
+
+	storage = sqlite
+
+Students are keyed by student id, scores by assignment and student, and
+absences by student and date. WebAssign scores are still read from their
+download. Existing csv files are moved into the database, and written back
+out of it, with
+
+	gradebook database import
+	gradebook database export
+
+Once the database holds a roster or attendance, a full import would replace
+them with the csv files, which are not kept up to date in sqlite mode, so it
+needs -force. New graded items are brought in on their own, leaving the
+roster and attendance alone, with
+
+	gradebook database import -grades
+'''
+import attendance
+import config
+import contextlib
+import csv_io
+import gradebook
+import logging
+import os
+import profiling
+import sqlite3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS students (
+	student_id TEXT PRIMARY KEY,
+	first_name TEXT NOT NULL,
+	last_name TEXT NOT NULL,
+	email TEXT NOT NULL,
+	preferred_name TEXT NOT NULL,
+	year TEXT NOT NULL,
+	status TEXT NOT NULL,
+	major TEXT NOT NULL,
+	position INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS assignments (
+	assignment_id INTEGER PRIMARY KEY,
+	category TEXT NOT NULL,
+	name TEXT NOT NULL,
+	points REAL,
+	UNIQUE (category, name)
+);
+
+CREATE TABLE IF NOT EXISTS scores (
+	assignment_id INTEGER NOT NULL REFERENCES assignments ON DELETE CASCADE,
+	student_id TEXT NOT NULL,
+	score REAL,
+	mark TEXT NOT NULL DEFAULT '',
+	PRIMARY KEY (assignment_id, student_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS absences (
+	student_id TEXT NOT NULL,
+	date TEXT NOT NULL,
+	position INTEGER NOT NULL,
+	PRIMARY KEY (student_id, date)
+);
+'''
+
+'''
+The columns of the students table holding each of Student.keys, in order.
+'''
+STUDENT_COLUMNS = ['student_id', 'first_name', 'last_name', 'email', 'preferred_name', 'year', 'status', 'major']
+
+TABLES = ['scores', 'assignments', 'absences', 'students']
+
+def manage_database(args):
+	if args.action == 'import':
+		if args.grades:
+			import_grades()
+		elif not args.force and has_records():
+			logging.warning('Must specify -force to replace the roster and attendance in the database, or -grades to import only the graded items.')
+		else:
+			import_csv()
+	elif args.action == 'export':
+		export_csv()
+
+@contextlib.contextmanager
+def open_database(create=False):
+	'''
+	Open the configured database for one transaction, which is committed if
+	the block finishes and rolled back otherwise. Unless create is set, the
+	database must already exist.
+	'''
+	path = config.DATABASE_PATH
+	if not create and not os.path.exists(path):
+		raise FileNotFoundError('Database "{}" does not exist. Create it with "gradebook database import".'.format(path))
+
+	connection = sqlite3.connect(path)
+	try:
+		connection.execute('PRAGMA foreign_keys = ON')
+		if create:
+			connection.executescript(SCHEMA)
+
+		with connection:
+			yield connection
+	finally:
+		connection.close()
+
+def initialize_database():
+	'''
+	Create the database, or empty it if it exists.
+	'''
+	with open_database(create=True) as db:
+		for table in TABLES:
+			db.execute('DELETE FROM {}'.format(table))
+
+def has_records():
+	'''
+	Check if the database exists and holds any students or absences.
+	'''
+	if not os.path.exists(config.DATABASE_PATH):
+		return False
+
+	with open_database(create=True) as db:
+		return any(
+			db.execute('SELECT 1 FROM {} LIMIT 1'.format(table)).fetchone()
+			for table in ['students', 'absences']
+		)
+
+def load_students():
+	'''
+	The students of the roster, in roster order.
+	'''
+	with open_database() as db:
+		rows = db.execute('SELECT {} FROM students ORDER BY position'.format(', '.join(STUDENT_COLUMNS))).fetchall()
+
+	return [gradebook.Student.from_row(row) for row in rows]
+
+def save_students(students):
+	'''
+	Update the students already in the roster and add the others at its end.
+	'''
+	assignments = ', '.join('{} = ?'.format(column) for column in STUDENT_COLUMNS[1:])
+
+	with open_database() as db:
+		position = db.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM students').fetchone()[0]
+
+		for student in students:
+			row = student.to_row()
+			cursor = db.execute(
+				'UPDATE students SET {} WHERE student_id = ?'.format(assignments),
+				row[1:] + row[:1]
+			)
+			if cursor.rowcount == 0:
+				insert_student(db, row, position)
+				position += 1
+
+def insert_student(db, row, position):
+	db.execute(
+		'INSERT INTO students ({}, position) VALUES ({})'.format(
+			', '.join(STUDENT_COLUMNS),
+			', '.join('?' * (len(STUDENT_COLUMNS) + 1)),
+		),
+		row + [position]
+	)
+
+def load_absences():
+	'''
+	Every absence as a (student id, date) pair, in the order recorded.
+	'''
+	with open_database() as db:
+		return db.execute('SELECT student_id, date FROM absences ORDER BY position').fetchall()
+
+def add_absences(student_ids, date):
+	with open_database() as db:
+		position = db.execute('SELECT COALESCE(MAX(position) + 1, 0) FROM absences').fetchone()[0]
+		db.executemany(
+			'INSERT OR IGNORE INTO absences (student_id, date, position) VALUES (?, ?, ?)',
+			[(student_id, date, position + i) for i, student_id in enumerate(student_ids)]
+		)
+
+def load_categorized_scores():
+	'''
+	Read the local grades in the form gradebook.parse_local_grades gives them:
+	a dictionary mapping each category to a list of (Assignment, scores) pairs.
+	'''
+	with open_database() as db:
+		assignments = db.execute(
+			'SELECT assignment_id, category, name, points FROM assignments ORDER BY assignment_id'
+		).fetchall()
+		rows = db.execute('SELECT assignment_id, student_id, score, mark FROM scores').fetchall()
+
+	scores = {assignment[0]: dict() for assignment in assignments}
+	marks = {assignment[0]: dict() for assignment in assignments}
+	for assignment_id, student_id, score, mark in rows:
+		scores[assignment_id][student_id] = gradebook.MISSING if score is None else score
+		if mark:
+			marks[assignment_id][student_id] = mark
+
+	profiling.count('grade rows', len(rows))
+
+	categorized_scores = dict()
+	for assignment_id, category, name, points in assignments:
+		assignment = gradebook.Assignment(category, name, points, marks[assignment_id])
+		categorized_scores.setdefault(category, []).append((assignment, scores[assignment_id]))
+
+	return categorized_scores
+
+@profiling.timed('database import')
+def import_csv():
+	'''
+	Replace the contents of the database with the csv roster, attendance
+	record and grade files.
+	'''
+	roster = gradebook.Roster(config.ROSTER_PATH)
+	roster.refresh()
+	record = attendance.AttendanceRecord(config.ATTENDANCE_PATH).load()
+	local_grades = gradebook.parse_local_grades()
+
+	initialize_database()
+
+	with open_database() as db:
+		for position, student in enumerate(roster.all_students()):
+			insert_student(db, student.to_row(), position)
+
+		db.executemany(
+			'INSERT INTO absences (student_id, date, position) VALUES (?, ?, ?)',
+			[
+				(student_id, date, position)
+				for position, (student_id, date) in enumerate(
+					(student_id, date)
+					for student_id, dates in record.by_student.items()
+					for date in dates
+				)
+			]
+		)
+
+		insert_grades(db, local_grades)
+
+	print('Imported {} students, {} absences and {} graded items into {}'.format(
+		len(roster.all_students()),
+		sum(len(dates) for dates in record.by_student.values()),
+		sum(len(assignments) for assignments in local_grades.values()),
+		config.DATABASE_PATH,
+	))
+
+def import_grades():
+	'''
+	Replace the graded items in the database with the grade files, keeping
+	the roster and attendance.
+	'''
+	local_grades = gradebook.parse_local_grades()
+
+	with open_database(create=True) as db:
+		db.execute('DELETE FROM scores')
+		db.execute('DELETE FROM assignments')
+		insert_grades(db, local_grades)
+
+	print('Imported {} graded items into {}'.format(
+		sum(len(assignments) for assignments in local_grades.values()),
+		config.DATABASE_PATH,
+	))
+
+def insert_grades(db, local_grades):
+	for category, assignments in local_grades.items():
+		for assignment, scores in assignments:
+			cursor = db.execute(
+				'INSERT INTO assignments (category, name, points) VALUES (?, ?, ?)',
+				(category, assignment.name, assignment.points)
+			)
+			db.executemany(
+				'INSERT INTO scores (assignment_id, student_id, score, mark) VALUES (?, ?, ?, ?)',
+				[
+					(
+						cursor.lastrowid,
+						student_id,
+						None if gradebook.is_missing(score) else score,
+						assignment.marks.get(student_id, ''),
+					)
+					for student_id, score in scores.items()
+				]
+			)
+
+@profiling.timed('database export')
+def export_csv():
+	'''
+	Write the roster, attendance record and grade files back out of the
+	database, replacing the csv files.
+	'''
+	students = load_students()
+	csv_io.write_rows(config.ROSTER_PATH, [gradebook.Student.keys] + [s.to_row() for s in students])
+	gradebook.clear_roster_journal()
+
+	by_student = dict()
+	for student_id, date in load_absences():
+		by_student.setdefault(student_id, []).append(date)
+	csv_io.write_rows(config.ATTENDANCE_PATH, [[student_id] + dates for student_id, dates in by_student.items()])
+	attendance.clear_journal()
+
+	names = {s.student_id: s.last_first_name for s in students}
+	categorized_scores = load_categorized_scores()
+	for category, assignments in categorized_scores.items():
+		os.makedirs(os.path.join(config.GRADES_DIR, category), exist_ok=True)
+		for assignment, scores in assignments:
+			rows = [['Student ID', 'Name', 'Score']]
+			for student_id, score in scores.items():
+				rows.append([
+					student_id,
+					names.get(student_id, ''),
+					gradebook.format_score(score, assignment.marks.get(student_id, '')),
+				])
+			path = os.path.join(config.GRADES_DIR, category, '{}.csv'.format(assignment.name))
+			csv_io.write_rows(path, rows)
+
+	print('Exported {} students, {} absences and {} graded items from {}'.format(
+		len(students),
+		sum(len(dates) for dates in by_student.values()),
+		sum(len(assignments) for assignments in categorized_scores.values()),
+		config.DATABASE_PATH,
+	))
@@ -1,32 +1,105 @@
 #!/usr/bin/python3
 import config
+import concurrent.futures
+import contextlib
 import csv
 import gradebook
+import io
+import profiling
+import sys
+import threading
 
 import generate_canvas_gradebook
 import generate_grade_sheet
 import generate_webassign_roster
 
-def add_parser(subparsers):
-	parser = subparsers.add_parser('generate')
+def generate_specific(args):
+	'''
+	Write each requested output. When there are several, the roster and the
+	gradebook are loaded once and the outputs are written concurrently. What
+	each output prints is held back until all of them are done, then printed
+	one output after another, so their lines do not run together.
+	'''
+	if len(args.item) == 1:
+		print('Performing generation of type {}'.format(args.item[0]))
+		try:
+			generate_item(args.item[0], args)
+		except generate_canvas_gradebook.CanvasExportError as e:
+			print(e)
+			exit(1)
+		return
 
-	parser.add_argument('item',
-		choices = ['attendance', 'canvas', 'new', 'wa']
-	)
+	# Load what the outputs share before any of them start
+	gradebook.get_roster()
+	categorized_gradebook = None
+	if 'canvas' in args.item:
+		categorized_gradebook = gradebook.get_categorized_gradebook()
 
-	parser.set_defaults(func=generate_specific)
+	output = ThreadOutput(sys.stdout)
+	with contextlib.redirect_stdout(output), concurrent.futures.ThreadPoolExecutor(len(args.item)) as pool:
+		futures = [
+			pool.submit(output.collect, item, generate_item, item, args, categorized_gradebook)
+			for item in args.item
+		]
 
-def generate_specific(args):
-	print('Performing generation of type {}'.format(args.item))
-	if args.item == 'attendance':
+	# Report every output that could not be written, and raise any other error
+	failed = False
+	for item, future in zip(args.item, futures):
+		print('Performing generation of type {}'.format(item))
+		print(output.text(item), end='')
+		try:
+			future.result()
+		except generate_canvas_gradebook.CanvasExportError as e:
+			print('Unable to generate {}: {}'.format(item, e))
+			failed = True
+
+	if failed:
+		exit(1)
+
+class ThreadOutput(object):
+	'''
+	Stands in for stdout while outputs are written on several threads. What
+	is printed on a thread running collect is kept with its output, and
+	anything else goes straight to stdout.
+	'''
+
+	def __init__(self, stdout):
+		self.stdout = stdout
+		self.local = threading.local()
+		self.buffers = dict()
+
+	def collect(self, item, function, *arguments):
+		self.local.buffer = self.buffers[item] = io.StringIO()
+		try:
+			return function(*arguments)
+		finally:
+			self.local.buffer = None
+
+	def text(self, item):
+		buffer = self.buffers.get(item)
+		return '' if buffer is None else buffer.getvalue()
+
+	def write(self, text):
+		buffer = getattr(self.local, 'buffer', None)
+		if buffer is None:
+			return self.stdout.write(text)
+
+		return buffer.write(text)
+
+	def flush(self):
+		self.stdout.flush()
+
+def generate_item(item, args, categorized_gradebook=None):
+	if item == 'attendance':
 		generate_attendance_sheet(args)
-	elif args.item == 'canvas':
-		generate_canvas_gradebook.prepare_canvas_gradebook()
-	elif args.item == 'new':
+	elif item == 'canvas':
+		generate_canvas_gradebook.prepare_canvas_gradebook(categorized_gradebook, args.delta)
+	elif item == 'new':
 		generate_grade_sheet.generate_new_graded_item()
-	elif args.item == 'wa':
+	elif item == 'wa':
 		generate_webassign_roster.generate_roster(args)
 	
+@profiling.timed('output write')
 def generate_attendance_sheet(args):
 	print('Writing attendance sheet to {}')
 	students = sorted(gradebook.get_active_students(), key=lambda s: s.last_name)
@@ -1,149 +1,285 @@
 #!/usr/bin/python3
 import config
+import csv_io
 import gradebook
+import profiling
 
 import argparse
 import csv
+import json
 import os
 import re
 
-def prepare_canvas_gradebook():
+'''
+The columns identifying a student, at the start of every row of a Canvas file.
+SIS Login ID = PID, SIS User ID = student id, Name = first last
+'''
+IDENTIFICATION_HEADER = ['Student', 'ID', 'SIS User ID', 'SIS Login ID', 'Section']
+
+SECTION = 'MATH_2204_85460_201709'
+
+'''
+The grades of the last export, kept in the data folder to find what changed.
+'''
+SNAPSHOT_NAME = 'CanvasSnapshot.json'
+
+'''
+Canvas ignores blank cells in an upload, so a grade cleared since the last
+export is sent as this instead, the points a missing score is graded as.
+'''
+CLEARED_GRADE = '0'
+
+class CanvasExportError(Exception):
 	'''
-	Load all grades for all students, then write out a CSV for Canvas.
+	Raised when the upload cannot be written because grades are missing.
+	'''
+
+def prepare_canvas_gradebook(categorized_gradebook=None, delta=None):
+	'''
+	Load all grades for all students, unless they were already loaded, then
+	write out a CSV for Canvas.
 	'''
 	print('Starting')
-	categorized_gradebook = gradebook.get_categorized_gradebook()
-	write_canvas_gradebook(categorized_gradebook)
+	if categorized_gradebook is None:
+		categorized_gradebook = gradebook.get_categorized_gradebook()
+	write_canvas_gradebook(categorized_gradebook, delta)
 
-def write_canvas_gradebook(categorized_gradebook):
+@profiling.timed('output write')
+def write_canvas_gradebook(categorized_gradebook, delta=None):
 	'''
 	Take the loaded grades and write them into a csv that Canvas understands.
+	Every problem is collected and reported at the end. If any grade could not
+	be filled in, the previous upload file is left as it was.
+
+	In delta mode, only the assignments whose grades changed since the last
+	export are written, and if delta is 'rows', only the students whose grades
+	changed. Canvas leaves blank grades in an upload alone, so in either mode
+	a grade that was cleared since the last export is written as
+	CLEARED_GRADE.
 	'''
-	# Track IDs
-	student_id_dict, assignment_id_dict = get_canvas_ids()
+	template = CanvasTemplate.read(config.INPUT_CANVAS_PATH)
+	report = CanvasExportReport()
+	columns = match_canvas_columns(categorized_gradebook, template, report)
+	students = gradebook.get_active_students()
+	grades = collect_canvas_grades(columns, students, report)
 
-	canvas_grades = create_canvas_gradebook(
-		categorized_gradebook,
-		assignment_id_dict
-	)
+	for student in students:
+		if student.student_id not in template.canvas_ids:
+			report.add_missing_canvas_id(student)
 
-	# Keep an order
-	assignments_list = list(canvas_grades.keys())
+	headers = list(grades)
+	previous = load_snapshot()
+	if delta:
+		headers = [h for h in headers if grades[h] != previous.get(h)]
+		print('{} of {} assignments changed since the last export.'.format(len(headers), len(grades)))
+		if delta == 'rows':
+			students = [s for s in students if student_changed(s, headers, grades, previous)]
+			print('{} students have changed grades.'.format(len(students)))
+	upload = mark_cleared_grades(grades, headers, previous)
 
-	with open(config.OUTPUT_CANVAS_PATH, 'w') as f:
-		writer = csv.writer(f)
+	report.print_report()
 
-		# Write the headers to identify students
-		# SIS Login ID = PID
-		# SIS User ID = student id
-		# Name = first last
-		identification_header = ['Student', 'ID', 'SIS User ID', 'SIS Login ID', 'Section']
-		writer.writerow(identification_header + assignments_list)
+	if report.has_errors():
+		raise CanvasExportError('Aborting. {} was not changed.'.format(config.OUTPUT_CANVAS_PATH))
 
-		# Gotta write those points...
-		points = ['Points Possible'] + ([''] * (len(identification_header) - 1))
-		points_map = get_points_map()
-		points += [points_map[b] for b in assignments_list]
-		writer.writerow(points)
+	with csv_io.atomic_writer(config.OUTPUT_CANVAS_PATH) as f:
+		write_canvas_rows(csv.writer(f), template, headers, students, upload)
 
-		for student in gradebook.get_active_students():
-			write_student(writer, student, student_id_dict, canvas_grades, assignments_list)
-	
-def write_student(writer, student, id_dict, canvas_grades, assignments_list):
-	canvas_id = None
+	save_snapshot(grades)
 
-	try:
-		canvas_id = id_dict[student.student_id]
-	except KeyError:
-		print('Unable to find Canvas id for student {}'.format(student))
-
-	# idenfification
-	data = [student.last_first_name, canvas_id, student.student_id, student.pid]
-	data += ['MATH_2204_85460_201709']
-
-	# grades
-	for assignment in assignments_list:
-		try:
-			data.append(canvas_grades[assignment][student.student_id])
-		except KeyError:
-			print('Unable to find entry for {} ({}) in {}'.format(student.name, student.student_id, assignment))
-			print('Aborting.')
-			exit()
-
-	writer.writerow(data)
-
-def create_canvas_gradebook(categorized_gradebook, assignment_id_dict):
-	'''
-	Make a quickly searchable dictionary representing the gradebook for all
-	graded items. This includes making the correct headers.
-	'''
-	
-	canvas_grades = dict()
-	all_books = dict()
-
-	# Copy grades to a single leveled gradebook
-	for group in categorized_gradebook.values():
-		all_books.update(**group)
-
-	# Get the proper name for each assignment that Canvas will understand
-	for name, book in all_books.items():
-		try:
-			canvas_id = assignment_id_dict[name]
-		except:
+class CanvasTemplate(object):
+	'''
+	Canvas has its own ids for students, even if we use the PID, and you cannot
+	upload a grade unless you know the Canvas ID for that item. An old
+	gradebook downloaded from Canvas has both, along with the points of each
+	item, and all of them are read in a single pass over the file:
+
+		canvas_ids - a map from VT IDs to Canvas IDs for students
+		assignment_headers - a map from assignment names to the full Canvas
+		header with the ID, assuming your name matches what Canvas has
+		points - a map from each header to its points possible
+	'''
+
+	# Identifies the true name from a canvas name-id pairing
+	ASSIGNMENT_HEADER = re.compile(r'(.*) \(\d+\)')
+
+	def __init__(self):
+		self.canvas_ids = dict()
+		self.assignment_headers = dict()
+		self.points = dict()
+
+	@classmethod
+	def read(cls, path):
+		template = cls()
+
+		with open(path, 'r') as f:
+			reader = csv.reader(f)
+			header = next(reader)
+
+			for field in header:
+				match = cls.ASSIGNMENT_HEADER.match(field)
+				if match:
+					# If it has an id, add an assignment mapping (1=first
+					# matched group, 0=the whole matched string)
+					template.assignment_headers[match.group(1)] = field
+
+			# Canvas forces us to list the number of points for an assignment,
+			# which is the row under the headers
+			template.points = dict(zip(header, next(reader, [])))
+
+			id_column = header.index('ID')
+			student_id_column = header.index('SIS User ID')
+			for row in reader:
+				if len(row) > max(id_column, student_id_column):
+					template.canvas_ids[row[student_id_column]] = row[id_column]
+
+		return template
+
+class CanvasExportReport(object):
+	'''
+	The problems found while writing the Canvas upload. A student without a
+	Canvas id is only warned about, while an assignment or score that cannot
+	be found is an error, since the upload would be missing grades.
+	'''
+
+	def __init__(self):
+		self.missing_canvas_ids = []
+		self.missing_assignments = []
+		self.missing_entries = dict()
+
+	def has_errors(self):
+		return bool(self.missing_assignments or self.missing_entries)
+
+	def add_missing_canvas_id(self, student):
+		self.missing_canvas_ids.append(student)
+
+	def add_missing_assignment(self, name):
+		self.missing_assignments.append(name)
+
+	def add_missing_entry(self, student, header):
+		self.missing_entries.setdefault(student, []).append(header)
+
+	def print_report(self):
+		for student in self.missing_canvas_ids:
+			print('Unable to find Canvas id for student {}'.format(student))
+
+		for name in self.missing_assignments:
 			print('Unable to find equivalent to "{}" in canvas file.'.format(name))
-			exit()
 
-		canvas_grades[canvas_id] = book
+		for student, headers in self.missing_entries.items():
+			print('Unable to find entry for {} ({}) in {}'.format(
+				student.name,
+				student.student_id,
+				', '.join(headers),
+			))
+
+def match_canvas_columns(categorized_gradebook, template, report):
+	'''
+	Find the Canvas header of every assignment in the gradebook.
+
+	returns - a dictionary mapping the Canvas headers to the ScoreColumns of
+	the assignments, in gradebook order.
+	'''
+	columns = dict()
+
+	for category in categorized_gradebook:
+		for name, column in categorized_gradebook[category].items():
+			header = template.assignment_headers.get(name)
+			if header is None:
+				report.add_missing_assignment(name)
+			else:
+				columns[header] = column
+
+	return columns
+
+def collect_canvas_grades(columns, students, report):
+	'''
+	Take the grade of every student straight from the assignment columns, as
+	it is written in the upload.
+
+	returns - a dictionary mapping the Canvas headers to dictionaries of
+	student ids and grades.
+	'''
+	grades = dict()
+
+	for header, column in columns.items():
+		texts = dict()
+		for student in students:
+			try:
+				texts[student.student_id] = column.text(student.student_id)
+			except KeyError:
+				report.add_missing_entry(student, header)
+		grades[header] = texts
+
+	return grades
 
-	return canvas_grades
+def student_changed(student, headers, grades, previous):
+	'''
+	Whether any of the student's grades under the headers differs from the
+	last export.
+	'''
+	student_id = student.student_id
+
+	return any(
+		grades[header].get(student_id) != previous.get(header, dict()).get(student_id)
+		for header in headers
+	)
 
-def get_canvas_ids():
+def mark_cleared_grades(grades, headers, previous):
 	'''
-	Canvas has its own ids for students, even if we use the PID. So we load an
-	old gradebook and make a dictionary converting VT IDs to Canvas IDs.
-	Furthermore, you cannot upload a grade unless you know the Canvas ID for
-	that item. Thus, we can read the headers to parse this information,
-	assuming your name matches what Canvas has.
+	The grades under the headers, with CLEARED_GRADE in place of every grade
+	that is blank now but was not in the last export.
+	'''
+	upload = dict()
+
+	for header in headers:
+		texts = dict(grades[header])
+		previous_texts = previous.get(header, dict())
+		for student_id, text in texts.items():
+			if text == '' and previous_texts.get(student_id, ''):
+				texts[student_id] = CLEARED_GRADE
+		upload[header] = texts
+
+	return upload
 
-	return - a tuple of two dicts:
-		dict1 - a map from PID to Canvas ID for students
-		dict2 - a map from assignment names to the full quiz name with ID
+def write_canvas_rows(writer, template, headers, students, grades):
 	'''
-	student_id_dict = dict()
-	assignment_id_dict = dict()
+	Write the headers, the points and then a row for each student.
+	'''
+	writer.writerow(IDENTIFICATION_HEADER + headers)
+
+	points = ['Points Possible'] + ([''] * (len(IDENTIFICATION_HEADER) - 1))
+	writer.writerow(points + [template.points[header] for header in headers])
+
+	columns = [grades[header] for header in headers]
+
+	for student in students:
+		student_id = student.student_id
+		canvas_id = template.canvas_ids.get(student_id)
 
-	with open(config.INPUT_CANVAS_PATH, 'r') as f:
-		reader = csv.DictReader(f)
-		for row in reader:
-			student_id_dict[row['SIS User ID']] = row['ID']
+		data = [student.last_first_name, canvas_id, student_id, student.pid, SECTION]
+		data.extend(column.get(student_id, '') for column in columns)
 
-		# Grab all fields
-		fields = list(reader.fieldnames)
+		writer.writerow(data)
 
-		# Make a regex to identify the true name from a canvas name-id pairing
-		reg = re.compile(r'(.*) \(\d+\)')
+	profiling.count('output rows', len(students))
 
-		for field in fields:
-			match = reg.match(field)
-			if match:
-				# If it has an id, add an assignment mapping (1=first matched
-				# group, 0=the whole matched string)
-				assignment_id_dict[match.group(1)] = field
-		
-	return student_id_dict, assignment_id_dict
+def get_snapshot_path():
+	return os.path.join(config.DATA_DIR, SNAPSHOT_NAME)
 
-def get_points_map():
+def load_snapshot():
 	'''
-	Canvas forces us to list the number of points for an assignment. This
-	function finds that amount by parsing the example Canvas sheet.
+	The grades of the last export, or nothing if there was none.
 	'''
-	points_map = dict()
+	try:
+		with open(get_snapshot_path(), 'r') as f:
+			return json.load(f)
+	except FileNotFoundError:
+		return dict()
 
-	with open(config.INPUT_CANVAS_PATH, 'r') as f:
-		reader = csv.reader(f)
-		assignments_row = reader.__next__()
-		points_row = reader.__next__()
-		for assignment, points in zip(assignments_row, points_row):
-			points_map[assignment] = points
-	
-	return points_map
+def save_snapshot(grades):
+	'''
+	Record the grades that Canvas now has, for the next delta export.
+	'''
+	with csv_io.atomic_writer(get_snapshot_path()) as f:
+		json.dump(grades, f)
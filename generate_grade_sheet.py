@@ -8,7 +8,9 @@ import config
 import csv
 import gradebook
 import os
+import profiling
 
+@profiling.timed('output write')
 def generate_new_graded_item():
 	students = gradebook.get_active_students()
 
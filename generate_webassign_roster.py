@@ -5,7 +5,9 @@ import config
 import csv
 import gradebook
 import os
+import profiling
 
+@profiling.timed('output write')
 def generate_roster(args):
 	print('Creating WebAssign roster using saved roster.')
 	students = gradebook.get_active_students()
@@ -1,6 +1,28 @@
+import array
+import bisect
+import collections
+import collections.abc
+import concurrent.futures
 import csv
+import csv_io
 import config
+import gradebook_cache
 import os
+import profiling
+
+# Below this many files to parse, a pool of workers costs more than it saves
+PARALLEL_MINIMUM_FILES = 16
+
+# Roster changes journaled before they are folded into the roster file
+ROSTER_COMPACT_ENTRIES = 100
+
+'''
+The score of a student who is listed for an assignment without a number, such
+as a blank or an excused mark. It is not a number, so it never equals a real
+score, and grading counts it as 0 points. The mark itself is kept by the
+ScoreColumn so it can be written back out.
+'''
+MISSING = float('nan')
 
 class Student(object):
 	'''
@@ -13,6 +35,11 @@ class Student(object):
 	'''
 	keys = ['Student ID', 'First Name', 'Last Name', 'Email', 'Preferred Name', 'Year', 'Status', 'Major']
 
+	'''
+	The attribute holding each key, in the same order as the keys.
+	'''
+	__slots__ = ['_{}'.format(key.replace(' ', '_').lower()) for key in keys]
+
 	def __init__(self, data):
 		'''
 		Given a dictionary of data, create a student with the specified
@@ -27,10 +54,76 @@ class Student(object):
 			Status
 			Major
 		'''
+		self._assign([data[key] for key in Student.keys])
+
+	def _assign(self, values):
+		'''
+		Set every field from a sequence of values ordered like Student.keys.
+		'''
+		(
+			self._student_id,
+			self._first_name,
+			self._last_name,
+			self._email,
+			self._preferred_name,
+			self._year,
+			self._status,
+			self._major,
+		) = values
+
+	def _values(self):
+		return (
+			self._student_id,
+			self._first_name,
+			self._last_name,
+			self._email,
+			self._preferred_name,
+			self._year,
+			self._status,
+			self._major,
+		)
+
+	@classmethod
+	def from_csv(cls, csv_file):
+		'''
+		Create a student for every row of a roster csv file. The header is
+		read once to find the column of each key, and each row is then copied
+		straight into a new student.
+		'''
+		reader = csv.reader(csv_file)
+		header = next(reader, None)
+		if header is None:
+			return []
+
+		missing = [key for key in cls.keys if key not in header]
+		if missing:
+			raise KeyError('Roster is missing the columns {}'.format(missing))
+
+		columns = [header.index(key) for key in cls.keys]
+		students = []
+
+		for row in reader:
+			if not row:
+				continue
+			students.append(cls.from_row([row[column] for column in columns]))
+
+		return students
+
+	@classmethod
+	def from_row(cls, row):
+		'''
+		Create a student from a sequence of values ordered like Student.keys.
+		'''
+		student = cls.__new__(cls)
+		student._assign(row)
+
+		return student
 
-		for key in Student.keys:
-			safe_key = '_{}'.format(key.replace(' ', '_').lower())
-			setattr(self, safe_key, data[key])
+	def to_row(self):
+		'''
+		Return a list of values ordered like Student.keys.
+		'''
+		return list(self._values())
 	
 	@property
 	def first_name(self):
@@ -92,52 +185,366 @@ class Student(object):
 		the PID portion.
 		'''
 		email = self.email
-		return email[:email.find('@')]
+		return email.partition('@')[0]
 	
 	def to_dictionary(self):
 		'''
 		Return a dictionary with keys from Student.keys.
 		'''
-		data = dict()
-		for key in Student.keys:
-			data[key] = getattr(self, '_{}'.format(key.replace(' ', '_')).lower())
-
-		return data
+		return dict(zip(Student.keys, self._values()))
 
 	def __str__(self):
 		return self.name
 
+class EmailPrefixIndex(object):
+	'''
+	Finds the students whose email begins with a given prefix. Full PIDs are
+	looked up directly, and any other prefix is found by a binary search of
+	the sorted emails.
+	'''
+
+	def __init__(self, students):
+		self.by_pid = dict()
+		for student in students:
+			self.by_pid.setdefault(student.pid, []).append(student)
+
+		ordered = sorted(students, key=lambda s: s.email)
+		self.emails = [s.email for s in ordered]
+		self.students = ordered
+
+	def find(self, prefix):
+		'''
+		Return the list of students matching the prefix. A student whose PID
+		is exactly the prefix is preferred over longer PIDs sharing it.
+		'''
+		if prefix in self.by_pid:
+			return list(self.by_pid[prefix])
+
+		start = bisect.bisect_left(self.emails, prefix)
+		end = start
+		while end < len(self.emails) and self.emails[end].startswith(prefix):
+			end += 1
+
+		return self.students[start:end]
+
+def normalize_score(value):
+	'''
+	Convert a recorded score to a float, or MISSING if it is not a number.
+	'''
+	try:
+		return float(value)
+	except ValueError:
+		return MISSING
+
+def is_missing(score):
+	return score != score
+
+def format_score(score, mark=''):
+	'''
+	Write a score the way it would be typed: whole numbers without a decimal
+	point, and the mark recorded in place of a missing score.
+	'''
+	if is_missing(score):
+		return mark
+
+	if score.is_integer():
+		return str(int(score))
+
+	return repr(score)
+
+class StudentIndex(object):
+	'''
+	Numbers the students of a gradebook in the order they are first seen, so
+	that every assignment can keep its scores in an array with a slot for each
+	student.
+	'''
+
+	def __init__(self):
+		self.positions = dict()
+		self.student_ids = []
+
+	def __len__(self):
+		return len(self.student_ids)
+
+	def __contains__(self, student_id):
+		return student_id in self.positions
+
+	def add(self, student_id):
+		'''
+		Return the position of the student, numbering them if they are new.
+		'''
+		position = self.positions.get(student_id)
+		if position is None:
+			position = len(self.student_ids)
+			self.positions[student_id] = position
+			self.student_ids.append(student_id)
+
+		return position
+
+	def find(self, student_id):
+		'''
+		Return the position of the student, or raise a KeyError if they have
+		not been numbered.
+		'''
+		return self.positions[student_id]
+
+'''
+An entry of the assignment catalog of a Gradebook: the category and name of
+the assignment, its maximum points if known, and the marks recorded in place
+of its missing scores, by student id.
+'''
+Assignment = collections.namedtuple('Assignment', ['category', 'name', 'points', 'marks'])
+
+class Gradebook(collections.abc.Mapping):
+	'''
+	All the scores of the course in one matrix of floats. Students are the
+	rows, numbered by a StudentIndex, and assignments are the columns, listed
+	in a catalog of Assignment entries. The matrix is stored a column at a
+	time, and the columns of a category are next to each other, so a column
+	or a whole category is a single slice of it. Whether each cell was listed
+	in its grade file is kept in a matching bytearray.
+
+	For the modules that expect nested dictionaries, the gradebook is also a
+	mapping of categories to mappings of assignment names to ScoreColumns:
+
+		gradebook[category][assignment][student_id]
+	'''
+
+	def __init__(self, categorized_scores):
+		'''
+		Build the gradebook from a dictionary mapping each category to a list of
+		(Assignment, scores) pairs, where the scores map student ids to floats.
+		'''
+		self.students = StudentIndex()
+		self.catalog = []
+		self.columns = dict()
+		self.category_ranges = dict()
+
+		for category, assignments in categorized_scores.items():
+			start = len(self.catalog)
+			for assignment, scores in assignments:
+				self.columns[category, assignment.name] = len(self.catalog)
+				self.catalog.append(assignment)
+				for student_id in scores:
+					self.students.add(student_id)
+			self.category_ranges[category] = range(start, len(self.catalog))
+
+		rows = len(self.students)
+		self.matrix = array.array('d', [MISSING]) * (rows * len(self.catalog))
+		self.present = bytearray(rows * len(self.catalog))
+
+		for category, assignments in categorized_scores.items():
+			for assignment, scores in assignments:
+				offset = self.columns[category, assignment.name] * rows
+				for student_id, score in scores.items():
+					cell = offset + self.students.find(student_id)
+					self.matrix[cell] = score
+					self.present[cell] = 1
+
+		self.views = {category: CategoryView(self, category) for category in self.category_ranges}
+		self.score_columns = dict()
+
+	@property
+	def row_count(self):
+		return len(self.students)
+
+	def column(self, category, assignment):
+		'''
+		The ScoreColumn of an assignment.
+		'''
+		column = self.columns[category, assignment]
+		if column not in self.score_columns:
+			self.score_columns[column] = ScoreColumn(self, column)
+
+		return self.score_columns[column]
+
+	def category_slice(self, category):
+		'''
+		The scores of every assignment in the category, as a memoryview of the
+		matrix holding one column after another in catalog order.
+		'''
+		columns = self.category_ranges[category]
+		rows = self.row_count
+		return memoryview(self.matrix)[columns.start * rows:columns.stop * rows]
+
+	def __getitem__(self, category):
+		return self.views[category]
+
+	def __iter__(self):
+		return iter(self.views)
+
+	def __len__(self):
+		return len(self.views)
+
+class CategoryView(collections.abc.Mapping):
+	'''
+	The assignments of one category of a Gradebook, mapping their names to
+	their ScoreColumns.
+	'''
+
+	def __init__(self, gradebook, category):
+		self.gradebook = gradebook
+		self.category = category
+
+	def __getitem__(self, assignment):
+		return self.gradebook.column(self.category, assignment)
+
+	def __iter__(self):
+		catalog = self.gradebook.catalog
+		return (catalog[c].name for c in self.gradebook.category_ranges[self.category])
+
+	def __len__(self):
+		return len(self.gradebook.category_ranges[self.category])
+
+	def __contains__(self, assignment):
+		return (self.category, assignment) in self.gradebook.columns
+
+class ScoreColumn(object):
+	'''
+	The scores of one assignment: a column of a Gradebook, with a slot for each
+	student. Students that were not listed for the assignment are absent, and
+	looking them up raises a KeyError just like the dictionary of scores by
+	student id it stands in for.
+	'''
+
+	def __init__(self, gradebook, column):
+		rows = gradebook.row_count
+		start = column * rows
+
+		self.index = gradebook.students
+		self.assignment = gradebook.catalog[column]
+		self.values = memoryview(gradebook.matrix)[start:start + rows]
+		self.present = memoryview(gradebook.present)[start:start + rows]
+
+	@property
+	def points(self):
+		return self.assignment.points
+
+	@property
+	def marks(self):
+		return self.assignment.marks
+
+	def position(self, student_id):
+		position = self.index.find(student_id)
+		if not self.present[position]:
+			raise KeyError(student_id)
+
+		return position
+
+	def __getitem__(self, student_id):
+		return self.values[self.position(student_id)]
+
+	def __contains__(self, student_id):
+		try:
+			self.position(student_id)
+		except KeyError:
+			return False
+
+		return True
+
+	def text(self, student_id):
+		'''
+		The score of the student as it would be typed into a grade file.
+		'''
+		return format_score(self[student_id], self.marks.get(student_id, ''))
+
+	def get(self, student_id, default=None):
+		try:
+			return self[student_id]
+		except KeyError:
+			return default
+
+	def __len__(self):
+		return sum(self.present)
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def keys(self):
+		ids = self.index.student_ids
+		return [ids[p] for p, present in enumerate(self.present) if present]
+
+	def items(self):
+		ids = self.index.student_ids
+		return [(ids[p], self.values[p]) for p, present in enumerate(self.present) if present]
+
 def get_categorized_gradebook():
 	'''
-	Given a file with WebAssign grades, create a gradebook with categories
-	using the locally stored grades.
+	Given a file with WebAssign grades, create a Gradebook with categories
+	using the locally stored grades, which are read from the database if it is
+	the configured storage.
 	'''
-	students = get_active_students()
-	wa_grades = parse_webassign(students)
-	local_grades = parse_local_grades()
-	full_gradebook = local_grades.copy()
-	full_gradebook['WebAssign'] = wa_grades
+	cache = gradebook_cache.open_cache()
+
+	wa_scores, wa_points = cache.fetch(
+		config.INPUT_WA_SCORES_PATH,
+		lambda: parse_webassign(get_active_students()),
+		dependencies=get_roster_sources()
+	)
+	if config.STORAGE == 'sqlite':
+		import database
+		categorized_scores = database.load_categorized_scores()
+	else:
+		categorized_scores = parse_local_grades(cache)
+	categorized_scores['WebAssign'] = [
+		(Assignment('WebAssign', assignment, wa_points[assignment], dict()), scores)
+		for assignment, scores in wa_scores.items()
+	]
+
+	gradebook = Gradebook(categorized_scores)
 
-	return full_gradebook
+	cache.save()
 
+	return gradebook
+
+@profiling.timed('webassign parse')
 def parse_webassign(students):
 	'''
 	WebAssign sends out a mostly human readable, but terriblely formatted
 	gradesheet. Tread the notes carefully.
 
-	returns - a dictionary gradebook. The keys are the quiz names. The data for
-	a quiz is another dictionary, this one containing student ids that map to
-	the points for that student. NS or ND are interpreted as 0.
+	returns - a tuple of two dictionaries keyed by the quiz names. The first
+	maps each quiz to another dictionary, this one containing student ids that
+	map to the points for that student. NS or ND are interpreted as 0. The
+	second maps each quiz to its maximum points.
 	'''
 	print('Parsing WebAssign file')
 	
-	# Get the TAB sepearated CSV file
-	wa_contents = []
+	# Get the TAB sepearated CSV file, one row at a time
 	with open(config.INPUT_WA_SCORES_PATH, 'r') as wa_file:
-		reader = csv.reader(wa_file)
-		for row in reader:
-			wa_contents.append(row)
+		rows = csv.reader(wa_file)
+		ordered_assignments, points = read_webassign_header(rows)
+		assignments = {assignment: dict() for assignment in ordered_assignments}
+
+		# Next, try to match the students WebAssign username to an actual student
+		# id, since the WebAssign student id is worthless (thanks FERPA?).
+		# Apparently, the WA username is a prefix for the email (aka PID)
+		email_index = EmailPrefixIndex(students)
+
+		for wa_username, scores in iterate_webassign_scores(rows):
+			student_id = match_webassign_username(email_index, wa_username)
+			if student_id is None:
+				continue
+
+			# For my next trick, I assign everything into the assignments
+			# dictionary as it is read.
+			for assignment, score in zip(ordered_assignments, scores):
+				score = normalize_score(score)
+				if is_missing(score):
+					score = 0.0
+
+				assignments[assignment][student_id] = score
 	
+	# For my final trick, I assign the max points for each assignment.
+	return assignments, dict(zip(ordered_assignments, points))
+
+def read_webassign_header(rows):
+	'''
+	Consume the rows of the WebAssign file that come before the scores.
+
+	returns - a tuple of the assignment names and their points, in the order
+	they appear in each score row.
+	'''
 	# The first 4 (0-3) rows are information about the class and download date
 	# The next row (4) contains assignment names from column 5 onward (zero index)
 	# Similarly, row 5 contains the point values for those same assignments
@@ -145,118 +552,370 @@ def parse_webassign(students):
 	# Finally, the student table. First row here outlines the headers
 	# [Fullname, Username, Student ID]
 	# before finally getting down to the scores...
+	header = [next(rows) for _ in range(9)]
 
-	ordered_assignments = wa_contents[4][5:] # Keep the order for the scores
-	assignments = {assignment: dict() for assignment in ordered_assignments}
-	scores = wa_contents[9:]
-
-	# Next, try to match the students WebAssign username to an actual student
-	# id, since the WebAssign student id is worthless (thanks FERPA?).
-	# Apparently, the WA username is a prefix for the email (aka PID)
-	username_to_id = {}
-	for row in scores:
-		wa_username = row[1]
-		prefix = wa_username[:wa_username.find('@')]
-		for student in students:
-			if student.email.startswith(prefix):
-				username_to_id[wa_username] = student.student_id
-				break
-		
-		if wa_username not in username_to_id:
-			print('\tUnable to find match for WebAssign id "{}" in roster emails.'.format(wa_username))
-	
-	# For my next trick, I iterate through the scores and assign everything
-	# into the assignments dictionary.
-	for row in scores:
-		if row[1] not in username_to_id:
-			continue
+	ordered_assignments = header[4][5:] # Keep the order for the scores
+	points = []
+	for value in header[5][5:5 + len(ordered_assignments)]:
+		try:
+			points.append(float(value))
+		except ValueError:
+			# Left to the configured points
+			points.append(None)
 
-		student_id = username_to_id[row[1]]
+	return ordered_assignments, points
 
-		for assignment, score in zip(ordered_assignments, row[5:]):
-			try:
-				score=float(score)
-			except ValueError:
-				score=0
+def iterate_webassign_scores(rows):
+	'''
+	Yield the WebAssign username and the assignment scores of each remaining
+	row.
+	'''
+	for row in rows:
+		profiling.count('webassign rows')
+		yield row[1], row[5:]
 
-			assignments[assignment][student_id] = score
-	
-	# For my final trick, I assign the max points for each assignment. When I
-	# created this, the max was uniform to 20.
-	# TODO Update to properly read the max points.
-	for assignment in assignments:
-		assignments[assignment]['points'] = 20
+def match_webassign_username(email_index, wa_username):
+	'''
+	Find the student id belonging to a WebAssign username, or None if there is
+	no single student matching it.
+	'''
+	prefix = wa_username.partition('@')[0]
+	matches = email_index.find(prefix)
 
-	return assignments
+	if len(matches) == 1:
+		return matches[0].student_id
 
-def parse_local_grades():
+	if matches:
+		print('\tAmbiguous match for WebAssign id "{}" in roster emails: {}'.format(
+			wa_username,
+			', '.join(s.email for s in matches),
+		))
+	else:
+		print('\tUnable to find match for WebAssign id "{}" in roster emails.'.format(wa_username))
+
+	return None
+
+@profiling.timed('local grade parse')
+def parse_local_grades(cache=None):
 	'''
 	Explore the grades folder. Each subfolder is an assignment group. Each file
-	in each subfolder is a single graded item. Then each graded item is a score
-	dictionary.
+	in each subfolder is a single graded item. Then each graded item is an
+	Assignment and its scores, ready to be put in a Gradebook. If a cache is
+	given, unchanged files are not parsed again.
 	'''
 	local_grades = dict()
+	group_files = dict()
 
 	for group in os.listdir(config.GRADES_DIR):
 		if os.path.isdir(os.path.join(config.GRADES_DIR, group)):
-			local_grades[group] = parse_grouped_grades(group)
+			print('Looking up group {}'.format(group))
+			group_files[group] = list_group_files(group)
+
+	# Parse the files of every group together, so they can share the workers
+	filepaths = [path for files in group_files.values() for _, path in files]
+	parsed = dict(zip(filepaths, parse_assignment_files(filepaths, cache)))
+
+	for group, files in group_files.items():
+		local_grades[group] = collect_group(
+			group,
+			files,
+			[parsed[path] for _, path in files]
+		)
 	
 	return local_grades 
 
-def parse_grouped_grades(group):
+@profiling.timed('local grade parse')
+def parse_grouped_grades(group, cache=None):
 	'''
 	Explore each subfile in the group folder, and load them into a gradebook.
 	'''
-	assignments = dict()
 	print('Looking up group {}'.format(group))
+	files = list_group_files(group)
+	scores = parse_assignment_files([path for _, path in files], cache)
+
+	return Gradebook({group: collect_group(group, files, scores)})[group]
+
+def list_group_files(group):
+	'''
+	Find the graded items of a group folder as (name, filepath) pairs.
+	'''
+	files = []
 	basepath = os.path.join(config.GRADES_DIR, group)
 
 	for assignment in os.listdir(basepath):
 		name, ext = os.path.splitext(assignment)
-		if os.path.isfile(os.path.join(basepath, assignment)) and ext == '.csv':
-			assignments[name] = parse_assignment(os.path.join(basepath, assignment))
+		filepath = os.path.join(basepath, assignment)
+		if os.path.isfile(filepath) and ext == '.csv':
+			files.append((name, filepath))
+
+	return files
 
-		# Assign the max points based on the groups
-		if group == 'homework':
-			assignments[name]['points'] = 10
+def collect_group(group, files, scores):
+	'''
+	Pair the parsed scores of a group's files with their Assignment entries.
+	The files do not give the maximum points, which are left to the
+	configuration.
+	'''
+	assignments = []
+
+	for (name, _), (assignment_scores, marks) in zip(files, scores):
+		assignments.append((Assignment(group, name, None, marks), assignment_scores))
 	
 	return assignments 
 
+def parse_assignment_files(filepaths, cache=None):
+	'''
+	Parse the assignment files, in order. If a cache is given, only the files
+	that changed are parsed.
+	'''
+	if cache is None:
+		return parse_assignments(filepaths)
+
+	return cache.fetch_all(filepaths, parse_assignments)
+
+def parse_assignments(filepaths):
+	'''
+	Parse the assignment files, in order. When more than one worker is
+	configured and there are enough files to make it worthwhile, the files are
+	split across a pool of processes.
+	'''
+	for filepath in filepaths:
+		print('\tParsing assignment {}'.format(filepath))
+
+	if config.WORKERS > 1 and len(filepaths) >= PARALLEL_MINIMUM_FILES:
+		with concurrent.futures.ProcessPoolExecutor(config.WORKERS) as pool:
+			chunksize = max(1, len(filepaths) // (4 * config.WORKERS))
+			parsed = list(pool.map(parse_assignment, filepaths, chunksize=chunksize))
+	else:
+		parsed = [parse_assignment(filepath) for filepath in filepaths]
+
+	profiling.count('grade files', len(parsed))
+	profiling.count('grade rows', sum(len(scores) for scores, _ in parsed))
+
+	return parsed
+
 def parse_assignment(filepath):
 	'''
 	Return a dictionary mapping student ids to grades for a given assignment.
+	The grades are converted to floats as they are read. Also return a
+	dictionary of the marks, like x or EX, recorded in place of a number.
 	'''
-	print('\tParsing assignment {}'.format(filepath))
 	scores = dict()
+	marks = dict()
 
 	with open(filepath, 'r') as f:
 		reader = csv.DictReader(f)
 		for row in reader:
-			scores[row['Student ID']] = row['Score']
+			score = normalize_score(row['Score'])
+			if is_missing(score) and row['Score']:
+				marks[row['Student ID']] = row['Score']
+
+			scores[row['Student ID']] = score
 	
-	return scores
+	return scores, marks
+
+class Roster(object):
+	'''
+	The students listed in the roster file. The file is read once and reused
+	until its size or modification time changes. Students can be looked up by
+	their student id, their PID, or their status.
+
+	Changes to the roster are appended to a journal of student rows instead of
+	rewriting the roster file. Each row replaces the student with the same id,
+	or adds them if they are new, and the journal is folded into the roster
+	file in the background once it has ROSTER_COMPACT_ENTRIES rows.
+	'''
+
+	def __init__(self, path):
+		self.path = path
+		self.journal = self.open_journal()
+		self.journal_entries = 0
+		self.signature = None
+		self.students = []
+		self.by_id = dict()
+		self.by_pid = dict()
+		self.by_status = dict()
+
+	def open_journal(self):
+		return csv_io.Journal(self.path + csv_io.JOURNAL_SUFFIX)
+
+	@profiling.timed('roster load')
+	def refresh(self):
+		'''
+		Reload the roster file and its journal if either changed since they
+		were last read.
+		'''
+		with csv_io.storage_lock:
+			signature = (gradebook_cache.get_signature(self.path), self.journal.signature())
+			if signature == self.signature:
+				return
+
+			with open(self.path, 'r') as f:
+				students = Student.from_csv(f)
+			changes = [Student.from_row(row) for row in self.journal.read() if len(row) == len(Student.keys)]
+		profiling.count('roster rows', len(students) + len(changes))
+
+		self.signature = signature
+		self.students = students
+		self.journal_entries = len(changes)
+		self.apply_changes(changes)
+
+	def apply_changes(self, changed_students):
+		'''
+		Replace the students with the same ids as the changed students, add the
+		others, and index the result.
+		'''
+		positions = {s.student_id: i for i, s in enumerate(self.students)}
+		for student in changed_students:
+			position = positions.get(student.student_id)
+			if position is None:
+				positions[student.student_id] = len(self.students)
+				self.students.append(student)
+			else:
+				self.students[position] = student
+
+		self.by_id = {s.student_id: s for s in self.students}
+		self.by_pid = dict()
+		self.by_status = dict()
+		for student in self.students:
+			self.by_pid.setdefault(student.pid, []).append(student)
+			self.by_status.setdefault(student.status, []).append(student)
+
+	def save_changes(self, changed_students):
+		'''
+		Apply the changed students and append them to the journal. Once the
+		journal is long enough, the roster file is rewritten in the background.
+		'''
+		changed_students = list({s.student_id: s for s in changed_students}.values())
+		if not changed_students:
+			return
+
+		with csv_io.storage_lock:
+			self.apply_changes(changed_students)
+			self.journal.append([s.to_row() for s in changed_students])
+			self.journal_entries += len(changed_students)
+
+		if self.journal_entries >= ROSTER_COMPACT_ENTRIES:
+			self.journal.compact_in_background(self.path, self.to_rows)
+			self.journal_entries = 0
+
+	def to_rows(self):
+		return [Student.keys] + [s.to_row() for s in self.students]
+
+	def all_students(self):
+		return list(self.students)
+
+	def with_status(self, *statuses):
+		'''
+		Get the students having any of the statuses, in roster order.
+		'''
+		if len(statuses) == 1:
+			return list(self.by_status.get(statuses[0], []))
+
+		return [s for s in self.students if s.status in statuses]
+
+	def find_by_id(self, student_id):
+		return self.by_id.get(student_id)
+
+	def find_by_pid(self, pid):
+		'''
+		Get the students with the PID, in roster order. Emails at different
+		domains can share a PID.
+		'''
+		return list(self.by_pid.get(pid, []))
+
+class DatabaseRoster(Roster):
+	'''
+	The roster kept in the database instead of the roster file. It is read
+	again whenever the database changes, and changes are saved straight to the
+	students table, so it has no journal.
+	'''
+
+	def open_journal(self):
+		return None
+
+	@profiling.timed('roster load')
+	def refresh(self):
+		import database
+
+		signature = gradebook_cache.get_signature(self.path)
+		if signature == self.signature:
+			return
+
+		students = database.load_students()
+		profiling.count('roster rows', len(students))
+
+		self.signature = signature
+		self.students = students
+		self.apply_changes([])
+
+	def save_changes(self, changed_students):
+		import database
+
+		changed_students = list({s.student_id: s for s in changed_students}.values())
+		if not changed_students:
+			return
+
+		database.save_students(changed_students)
+		self.apply_changes(changed_students)
+
+_roster = None
+
+def get_roster():
+	'''
+	Get the shared roster for this run, rereading the roster file only if it
+	changed.
+	'''
+	global _roster
+
+	if config.STORAGE == 'sqlite':
+		roster_class, path = DatabaseRoster, config.DATABASE_PATH
+	else:
+		roster_class, path = Roster, config.ROSTER_PATH
+
+	if _roster is None or _roster.path != path:
+		_roster = roster_class(path)
+
+	_roster.refresh()
+
+	return _roster
+
+def get_roster_sources():
+	'''
+	The files the roster is read from, whether they exist or not.
+	'''
+	if config.STORAGE == 'sqlite':
+		return [config.DATABASE_PATH]
+
+	return [config.ROSTER_PATH, config.ROSTER_PATH + csv_io.JOURNAL_SUFFIX]
+
+def clear_roster_journal():
+	'''
+	Remove the journal of roster changes, for when the roster file itself is
+	replaced.
+	'''
+	csv_io.Journal(config.ROSTER_PATH + csv_io.JOURNAL_SUFFIX).clear()
+
+def invalidate_roster():
+	'''
+	Forget the loaded roster so the file is read again on the next request.
+	Call this after writing the roster file.
+	'''
+	global _roster
+	_roster = None
 
 def get_all_students():
 	'''
 	Get all students regardless of status.
 	'''
-	students = None
-	with open(config.ROSTER_PATH, 'r') as f:
-		reader = csv.DictReader(f)
-		
-		students = [Student(s) for s in reader]
-	
-	return students
+	return get_roster().all_students()
 
 def get_active_students():
 	'''
 	Load all students from the roster whose status is active.
 	If there are no students, return None.
 	'''
-	students = get_all_students()
-	students = [s for s in students if s.status == 'Active']
-
-	return students
+	return get_roster().with_status('Active')
 
 def interactive_find_student():
 	'''
@@ -0,0 +1,180 @@
+'''
+module gradebook_cache
+
+Parsing the gradebook means opening every graded item under the grades folder
+and the WebAssign export on every run. This module keeps the parsed results in
+a single binary file in the data folder, along with the size and modification
+time of the files they came from, so only the files that changed since the
+last run need to be parsed again.
+
+The file is written with marshal, which only stores plain Python values and so
+cannot execute anything when loaded.
+'''
+import config
+import gradebook
+import profiling
+
+import logging
+import marshal
+import os
+
+CACHE_NAME = 'GradebookCache.bin'
+TOTALS_NAME = 'GradeTotals.bin'
+CACHE_VERSION = 2
+
+ENABLED = True
+
+def manage_cache(args):
+	clear_cache()
+
+	if args.action == 'rebuild':
+		print('Rebuilding gradebook cache')
+		gradebook.get_categorized_gradebook()
+
+def disable():
+	'''
+	Stop reading and writing the cache for the rest of this run.
+	'''
+	global ENABLED
+	ENABLED = False
+
+def get_cache_path():
+	return os.path.join(config.DATA_DIR, CACHE_NAME)
+
+def get_totals_path():
+	return os.path.join(config.DATA_DIR, TOTALS_NAME)
+
+def clear_cache():
+	for path in [get_cache_path(), get_totals_path()]:
+		if os.path.exists(path):
+			os.remove(path)
+
+def get_signature(path, missing_ok=False):
+	'''
+	Summarize a file so that any modification to it is noticed. If missing_ok
+	is set, a file that does not exist is summarized as None.
+	'''
+	try:
+		stat = os.stat(path)
+	except FileNotFoundError:
+		if missing_ok:
+			return None
+		raise
+
+	return (stat.st_size, stat.st_mtime_ns)
+
+class GradebookCache(object):
+	'''
+	Parsed file contents keyed on the path of the file. Each entry remembers
+	the signature of its file and of any files it depends on, and is only
+	reused when all of them are unchanged.
+	'''
+
+	def __init__(self, path):
+		self.path = path
+		self.entries = dict()
+		self.used = set()
+		self.modified = False
+		self.entries = load_entries(path)
+
+	def fetch(self, source, parse, dependencies=()):
+		'''
+		Get the parsed contents of source, calling parse() only when the cached
+		contents are missing or out of date.
+		'''
+		signatures = (get_signature(source),) + tuple(get_signature(p, missing_ok=True) for p in dependencies)
+		self.used.add(source)
+
+		entry = self.entries.get(source)
+		if entry is not None and entry[0] == signatures:
+			return entry[1]
+
+		contents = parse()
+		self.entries[source] = (signatures, contents)
+		self.modified = True
+
+		return contents
+
+	def fetch_all(self, sources, parse_all):
+		'''
+		Get the parsed contents of every source, in order. All of the sources
+		whose cached contents are missing or out of date are handed to
+		parse_all() together, which returns their contents in the same order.
+		'''
+		stale = []
+		for source in sources:
+			self.used.add(source)
+			entry = self.entries.get(source)
+			if entry is None or entry[0] != (get_signature(source),):
+				stale.append(source)
+
+		if stale:
+			for source, contents in zip(stale, parse_all(stale)):
+				self.entries[source] = ((get_signature(source),), contents)
+			self.modified = True
+
+		return [self.entries[source][1] for source in sources]
+
+	@profiling.timed('cache save')
+	def save(self):
+		'''
+		Write the entries used during this run back to the cache file. Entries
+		for files that were not requested (such as deleted assignments) are
+		dropped.
+		'''
+		if not ENABLED:
+			return
+
+		if not self.modified and self.used == set(self.entries):
+			return
+
+		entries = {source: self.entries[source] for source in self.used}
+		write_cache_file(self.path, entries)
+
+@profiling.timed('cache load')
+def load_entries(path):
+	'''
+	Read the entries from the cache file. A missing, outdated or damaged cache
+	is treated as empty.
+	'''
+	entries = read_cache_file(path)
+
+	if entries is None:
+		return dict()
+
+	return entries
+
+def read_cache_file(path):
+	'''
+	Load the data stored in a cache file, or None if there is no usable data.
+	'''
+	if not ENABLED or not os.path.exists(path):
+		return None
+
+	try:
+		with open(path, 'rb') as f:
+			version, data = marshal.load(f)
+	except (EOFError, ValueError, TypeError):
+		logging.warning('Ignoring unreadable cache file {}'.format(path))
+		return None
+
+	if version != CACHE_VERSION:
+		return None
+
+	return data
+
+def write_cache_file(path, data):
+	'''
+	Replace the contents of a cache file with the data. The data is written to
+	a temporary file first, so an interrupted write leaves the old file alone.
+	'''
+	if not ENABLED:
+		return
+
+	temporary_path = path + '.tmp'
+	with open(temporary_path, 'wb') as f:
+		marshal.dump((CACHE_VERSION, data), f)
+	os.replace(temporary_path, path)
+
+def open_cache():
+	return GradebookCache(get_cache_path())
@@ -5,6 +5,381 @@ Implements methods that calculate a student's average for the course and can
 extrapolate from there.
 '''
 import config
+import gradebook_cache
+import profiling
+
+import bisect
+import heapq
+import marshal
+import zlib
+
+class ClassGrades(object):
+	'''
+	Calculates the grades of an entire class at once. Category grades come from
+	the running totals of each category (see CategoryTotals), and the semester
+	and letter grades are computed for every student from those in one pass.
+	The percentages of individual assignments are laid out as a score matrix,
+	one column per assignment with a row for each student, when they are
+	first asked for.
+	'''
+
+	def __init__(self, categorized_gradebook, students=(), totals=None):
+		self.gradebook = categorized_gradebook
+		self.schema = GradingSchema(categorized_gradebook)
+		self.categories = self.schema.categories
+
+		# Reuse the totals of any category whose policy has not changed
+		self.totals = dict()
+		for c, category in enumerate(self.categories):
+			settings = self.schema.settings[c]
+			category_totals = (totals or dict()).get(category)
+			if category_totals is None or category_totals.settings != settings:
+				category_totals = CategoryTotals(settings)
+			category_totals.synchronize(categorized_gradebook[category], self.category_points(category))
+			self.totals[category] = category_totals
+
+		self.columns = dict()
+		self.rows = dict()
+		self.student_ids = []
+		self.category_grades = {category: [] for category in self.categories}
+		self.semester_grades = []
+		self.letter_grades = []
+
+		self.add_students(students)
+
+	def category_points(self, category):
+		'''
+		The points of each assignment in the category, by name.
+		'''
+		schema = self.schema
+		return {
+			schema.assignments[i][1]: schema.points[i]
+			for i in schema.category_assignments[schema.category_index[category]]
+		}
+
+	def add_students(self, students):
+		'''
+		Append a row for each student not yet graded, then grade the new rows.
+		'''
+		students = [s for s in students if s.student_id not in self.rows]
+		if not students:
+			return
+
+		ids = [s.student_id for s in students]
+		profiling.count('graded students', len(ids))
+		start = len(self.rows)
+		for i, student_id in enumerate(ids):
+			self.rows[student_id] = start + i
+		self.student_ids.extend(ids)
+
+		for (category, assignment), column in self.columns.items():
+			column.extend(self.calculate_column(category, assignment, ids))
+
+		new_grades = []
+		for category in self.categories:
+			category_totals = self.totals[category]
+			category_totals.add_students(ids, self.gradebook[category], self.category_points(category))
+			grades = [category_totals.grade(i) for i in ids]
+			self.category_grades[category].extend(grades)
+			new_grades.append(grades)
+
+		weights = self.schema.weights
+		weight_sum = self.schema.weight_sum
+		for grades in zip(*new_grades):
+			score = sum(w * g for w, g in zip(weights, grades)) / weight_sum
+			self.semester_grades.append(score)
+			self.letter_grades.append(self.schema.letter(score))
+
+	@profiling.timed('grading')
+	def calculate_column(self, category, assignment, ids):
+		scores = self.gradebook[category][assignment]
+		points = self.schema.points[self.schema.assignment_index[category, assignment]]
+		return [score_points(scores.get(i)) / points for i in ids]
+
+	def column(self, category, assignment):
+		'''
+		The percentages of every graded student on the assignment, in row
+		order.
+		'''
+		if (category, assignment) not in self.columns:
+			self.columns[category, assignment] = self.calculate_column(
+				category,
+				assignment,
+				self.student_ids
+			)
+
+		return self.columns[category, assignment]
+
+	def assignment_grade(self, student, category, assignment):
+		return self.column(category, assignment)[self.rows[student.student_id]]
+
+	def category_grade(self, student, category):
+		return self.category_grades[category][self.rows[student.student_id]]
+
+	def semester_grade(self, student):
+		return self.semester_grades[self.rows[student.student_id]]
+
+	def letter_grade(self, student):
+		return self.letter_grades[self.rows[student.student_id]]
+
+	def assignment_average(self, category, assignment):
+		'''
+		The average percentage of all graded students on the assignment.
+		'''
+		column = self.column(category, assignment)
+		return sum(column) / len(column)
+
+	def class_average(self):
+		'''
+		The average semester grade of all graded students.
+		'''
+		return sum(self.semester_grades) / len(self.semester_grades)
+
+class GradingSchema(object):
+	'''
+	The grading policy compiled against the assignments of a gradebook. Every
+	category and assignment is given an index, so grading is done by indexing
+	into flat lists instead of looking up the configured weights:
+
+		assignments[i] - the (category, assignment) of assignment i
+		assignment_category[i] - the category index of assignment i
+		points[i] - the maximum points of assignment i
+		category_assignments[c] - the assignment indices of category c
+		weights[c], policies[c] - the weight and DropPolicy of category c
+
+	Letter grades are found with a binary search of the sorted cutoffs.
+	'''
+
+	def __init__(self, categorized_gradebook):
+		self.categories = list(categorized_gradebook)
+		self.category_index = {c: i for i, c in enumerate(self.categories)}
+
+		self.settings = []
+		self.weights = []
+		self.policies = []
+		self.category_assignments = []
+
+		self.assignments = []
+		self.assignment_index = dict()
+		self.assignment_category = []
+		self.points = []
+
+		for c, category in enumerate(self.categories):
+			settings = dict(config.GRADE_WEIGHTS[category])
+			self.settings.append(settings)
+			self.weights.append(settings['weight'])
+			self.policies.append(DropPolicy(settings))
+
+			indices = []
+			for assignment in categorized_gradebook[category]:
+				index = len(self.assignments)
+				self.assignments.append((category, assignment))
+				self.assignment_index[category, assignment] = index
+				self.assignment_category.append(c)
+				self.points.append(get_assignment_points(
+					category,
+					assignment,
+					categorized_gradebook[category][assignment].points
+				))
+				indices.append(index)
+			self.category_assignments.append(indices)
+
+		self.weight_sum = sum(self.weights)
+
+		ordered_cutoffs = sorted(config.GRADE_CUTOFFS, key=lambda cutoff: cutoff[1])
+		self.cutoff_letters = [letter for letter, _ in ordered_cutoffs]
+		self.cutoff_scores = [score for _, score in ordered_cutoffs]
+
+	def letter(self, score):
+		'''
+		The letter of the highest cutoff the score reaches, or None if it
+		reaches none of them.
+		'''
+		position = bisect.bisect_right(self.cutoff_scores, score)
+
+		if position == 0:
+			return None
+
+		return self.cutoff_letters[position - 1]
+
+class CategoryTotals(object):
+	'''
+	Running totals of one category for each student: the sum and count of the
+	student's percentages and a heap of the lowest percentages, as many as the
+	drop policy can ever drop, which is all that is needed to apply it. The
+	totals remember a fingerprint of each assignment folded into them, so a
+	new assignment is folded into the existing totals while a changed or
+	removed one starts them over.
+	'''
+
+	def __init__(self, settings, fingerprints=None, totals=None):
+		self.settings = settings
+		self.policy = DropPolicy(settings)
+		self.fingerprints = fingerprints or dict()
+		self.totals = totals or dict()
+		self.modified = False
+
+	def synchronize(self, assignments, points):
+		'''
+		Bring the totals up to date with the assignments of the category.
+		'''
+		fingerprints = {a: fingerprint_scores(scores, points[a]) for a, scores in assignments.items()}
+
+		for assignment, old_fingerprint in self.fingerprints.items():
+			if fingerprints.get(assignment) != old_fingerprint:
+				self.fingerprints = dict()
+				self.totals = dict()
+				self.modified = True
+				break
+
+		for assignment in assignments:
+			if assignment in self.fingerprints:
+				continue
+
+			scores = assignments[assignment]
+			for student_id, student_totals in self.totals.items():
+				self.fold(student_totals, score_points(scores.get(student_id)) / points[assignment])
+
+			self.fingerprints[assignment] = fingerprints[assignment]
+			self.modified = True
+
+	def add_students(self, student_ids, assignments, points):
+		'''
+		Calculate the totals of any student that does not have them yet.
+		'''
+		for student_id in student_ids:
+			if student_id in self.totals:
+				continue
+
+			student_totals = [0.0, 0, []]
+			for assignment, scores in assignments.items():
+				self.fold(student_totals, score_points(scores.get(student_id)) / points[assignment])
+
+			self.totals[student_id] = student_totals
+			self.modified = True
+
+	def fold(self, student_totals, percentage):
+		'''
+		Add a percentage to a student's totals. The lowest percentages are kept
+		in a heap of negated values, so the largest of them is on top.
+		'''
+		student_totals[0] += percentage
+		student_totals[1] += 1
+
+		lowest = student_totals[2]
+		depth = self.policy.depth
+		if depth is None or len(lowest) < depth:
+			heapq.heappush(lowest, -percentage)
+		elif lowest and percentage < -lowest[0]:
+			heapq.heapreplace(lowest, -percentage)
+
+	def grade(self, student_id):
+		'''
+		The student's average in the category after the drops.
+		'''
+		total, count, lowest = self.totals[student_id]
+		drops = self.policy.drop_count(count)
+		dropped = -sum(heapq.nlargest(drops, lowest))
+
+		return (total - dropped) / (1.0 * (count - drops))
+
+	def to_data(self):
+		return (self.settings, self.fingerprints, self.totals)
+
+	@classmethod
+	def from_data(cls, data):
+		settings, fingerprints, totals = data
+		return cls(settings, fingerprints, totals)
+
+class DropPolicy(object):
+	'''
+	Decides how many of a student's lowest scores in a category are dropped,
+	using these optional keys of the category's configured weights:
+
+		drops - drop this many of the lowest scores
+		keep - only count this many of the best scores
+		minimum - never count fewer than this many scores (1 by default)
+
+	At least one score is always counted, whatever the settings.
+	'''
+
+	def __init__(self, settings):
+		self.drops = settings.get('drops', None) or 0
+		self.keep = settings.get('keep', None)
+		self.minimum = settings.get('minimum', 1)
+
+	@property
+	def depth(self):
+		'''
+		The most scores that can ever be dropped, or None if there is no
+		limit.
+		'''
+		if self.keep is not None:
+			return None
+
+		return self.drops
+
+	def drop_count(self, count):
+		'''
+		The number of scores dropped out of count scores.
+		'''
+		drops = self.drops
+		if self.keep is not None:
+			drops = max(drops, count - self.keep)
+
+		return max(0, min(drops, count - max(self.minimum, 1)))
+
+def fingerprint_scores(scores, points):
+	'''
+	A checksum of an assignment's recorded scores and maximum points, used to
+	notice when either changes. The scores are sorted by student id, so the
+	checksum does not depend on the order the students were numbered in.
+	'''
+	return zlib.crc32(marshal.dumps((points, sorted(scores.items()))))
+
+def load_category_totals():
+	'''
+	Read the category totals saved by a previous run.
+	'''
+	data = gradebook_cache.read_cache_file(gradebook_cache.get_totals_path())
+	if data is None:
+		return dict()
+
+	return {category: CategoryTotals.from_data(d) for category, d in data.items()}
+
+def save_category_totals(totals):
+	'''
+	Save the category totals for the next run, if any of them changed.
+	'''
+	if not any(category_totals.modified for category_totals in totals.values()):
+		return
+
+	data = {category: t.to_data() for category, t in totals.items()}
+	gradebook_cache.write_cache_file(gradebook_cache.get_totals_path(), data)
+
+	for category_totals in totals.values():
+		category_totals.modified = False
+
+_class_grades = None
+
+@profiling.timed('grading')
+def get_class_grades(categorized_gradebook, students=()):
+	'''
+	Get the ClassGrades for the gradebook, making sure the given students are
+	graded. The previous result is reused while the same gradebook is passed
+	in, which lets the per-student functions below act as lookups. The category
+	totals are kept between runs, so only the categories that changed since
+	the last run are recalculated.
+	'''
+	global _class_grades
+
+	if _class_grades is None or _class_grades.gradebook is not categorized_gradebook:
+		_class_grades = ClassGrades(categorized_gradebook, totals=load_category_totals())
+
+	_class_grades.add_students(students)
+	save_category_totals(_class_grades.totals)
+
+	return _class_grades
 
 def calculate_semester_grade(student, gradebook):
 	'''
@@ -14,20 +389,7 @@ def calculate_semester_grade(student, gradebook):
 
 	Output: grade (as a float between 0 and 1)
 	'''
-	score = 0.0
-	weight_sum = 0.0
-
-	for category in gradebook:
-		category_info = config.GRADE_WEIGHTS[category]
-		weight = category_info['weight']
-		score += weight * calculate_category_grade(
-			student,
-			gradebook,
-			category
-		)
-		weight_sum += weight
-	
-	return score / weight_sum
+	return get_class_grades(gradebook, [student]).semester_grade(student)
 
 def calculate_category_grade(student, gradebook, category):
 	'''
@@ -35,51 +397,41 @@ def calculate_category_grade(student, gradebook, category):
 	student's grade in that category according to the configured scoring and
 	drops.
 	'''
-	scores = []
-
-	for assignment in gradebook[category]:
-		scores.append(
-			calculate_assignment_grade(
-				student,
-				gradebook,
-				category,
-				assignment
-			)
-		)
-	
-	drops = config.GRADE_WEIGHTS[category].get('drops', None)
-	if drops is not None:
-		for _ in range(drops):
-			scores.remove(min(scores))
-
-	return sum(scores) / (1.0 * len(scores))
+	return get_class_grades(gradebook, [student]).category_grade(student, category)
 
 def calculate_assignment_grade(student, gradebook, category, assignment):
 	'''
 	For a single assignment, get the student's percentage on the assignment.
 	'''
-	try:
-		score = float(gradebook[category][assignment][student.student_id])
-	except ValueError:
-		score = 0.0
-	
+	return get_class_grades(gradebook, [student]).assignment_grade(student, category, assignment)
+
+def calculate_student_letter_grade(student, gradebook):
+	return get_class_grades(gradebook, [student]).letter_grade(student)
+
+def score_points(score):
+	'''
+	The points of a recorded score. A missing score, or none at all for a
+	student left out of the assignment, counts as 0.
+	'''
+	if score is None or score != score:
+		return 0.0
+
+	return score
+
+def get_assignment_points(category, assignment, points=None):
+	'''
+	The maximum points of an assignment: the points given with its scores, such
+	as those in the WebAssign export, or else the configured points.
+	'''
+	if points is not None:
+		return points
+
 	points = config.GRADE_WEIGHTS[category].get('equally_scored')
 
 	if points is None:
 		points = config.GRADE_WEIGHTS[category][assignment]
-	
-	return score / points
 
-def calculate_student_letter_grade(student, gradebook):
-	score = calculate_semester_grade(student, gradebook)
-	student_letter = None
-
-	for letter, necessary_score in config.GRADE_CUTOFFS:
-		if score >= necessary_score:
-			student_letter = letter
-			break
-	
-	return student_letter
+	return points
 
 def extrapolate_scores(student, gradebook, extrapolate_category):
 	'''
@@ -129,9 +481,15 @@ def verify_gradebook_weights(categorized_gradebook):
 			else:
 				weight_sum += weights[category]['weight']
 
+			for key, least in [('drops', 0), ('keep', 1), ('minimum', 1)]:
+				value = weights[category].get(key)
+				if value is not None and (not isinstance(value, int) or value < least):
+					print('\tCategory "{}" has an invalid "{}" of {}.'.format(category, key, value))
+					all_good = False
+
 			if 'equally_scored' not in weights[category]:
-				for assignment in categorized_gradebook[category]:
-					if assignment not in weights[category]:
+				for assignment, scores in categorized_gradebook[category].items():
+					if scores.points is None and assignment not in weights[category]:
 						print('\tAssignment "{}" in category "{}" not found in configured grade weights'.format(
 							assignment,
 							category,
@@ -1,20 +1,17 @@
+import attendance
 import config
+import gradebook
 
 import csv
 import logging
 import os.path
 
-def add_parser(subparsers):
-	parser = subparsers.add_parser('init')
-	parser.add_argument('-force',
-		action='store_true',
-		help='Necessary to overwrite roster and attendance data.'
-	)
-
-	parser.set_defaults(func=initialize_gradebook)
-
 def initialize_gradebook(args):
-	if not args.force and (os.path.exists(config.ROSTER_PATH) or os.path.exists(config.ATTENDANCE_PATH)):
+	existing_paths = [config.ROSTER_PATH, config.ATTENDANCE_PATH]
+	if config.STORAGE == 'sqlite':
+		existing_paths.append(config.DATABASE_PATH)
+
+	if not args.force and any(os.path.exists(path) for path in existing_paths):
 		logging.warn('Must specify -force to override previous roster and attendance data.')
 		return
 	
@@ -26,6 +23,11 @@ def initialize_gradebook(args):
 		writer.writeheader()
 	with open(config.ATTENDANCE_PATH, 'w'):
 		pass
+	gradebook.clear_roster_journal()
+	attendance.clear_journal()
+	if config.STORAGE == 'sqlite':
+		import database
+		database.initialize_database()
 	
 	logging.info('Gradebook initialized.')
 
@@ -0,0 +1,121 @@
+'''
+module profiling
+
+Timers for the phases of a run (loading the roster, parsing grades, grading,
+writing output, ...) and counters for the amount of data handled in each. The
+other modules mark their phases with
+
+	with profiling.phase('roster load'):
+		...
+
+which costs nothing unless profiling was enabled with the --profile flag.
+Phases may be nested, in which case the time of the inner phase is not counted
+again as the "self" time of the outer one. Each thread nests its phases
+separately, and the times of every thread are added together.
+'''
+import contextlib
+import functools
+import json
+import threading
+import time
+
+ENABLED = False
+
+_phases = dict()
+_counts = dict()
+_lock = threading.Lock()
+_local = threading.local()
+
+def enable():
+	global ENABLED
+	ENABLED = True
+
+@contextlib.contextmanager
+def phase(name):
+	'''
+	Time the enclosed block as part of the named phase.
+	'''
+	if not ENABLED:
+		yield
+		return
+
+	stack = get_stack()
+	stack.append(0.0)
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		elapsed = time.perf_counter() - start
+		nested = stack.pop()
+		if stack:
+			stack[-1] += elapsed
+		record(name, elapsed, elapsed - nested)
+
+def get_stack():
+	'''
+	The nested phases of the current thread.
+	'''
+	if not hasattr(_local, 'stack'):
+		_local.stack = []
+
+	return _local.stack
+
+def timed(name):
+	'''
+	Decorate a function so that every call to it is timed as the named phase.
+	'''
+	def decorator(function):
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			with phase(name):
+				return function(*args, **kwargs)
+		return wrapper
+	return decorator
+
+def record(name, seconds, self_seconds=None):
+	'''
+	Add time to a phase that was measured some other way.
+	'''
+	if not ENABLED:
+		return
+
+	if self_seconds is None:
+		self_seconds = seconds
+
+	with _lock:
+		entry = _phases.setdefault(name, {'calls': 0, 'seconds': 0.0, 'self seconds': 0.0})
+		entry['calls'] += 1
+		entry['seconds'] += seconds
+		entry['self seconds'] += self_seconds
+
+def count(name, amount=1):
+	'''
+	Add to a counter, such as the number of rows or files read.
+	'''
+	if ENABLED:
+		with _lock:
+			_counts[name] = _counts.get(name, 0) + amount
+
+def summary():
+	return {
+		'phases': {name: dict(entry) for name, entry in _phases.items()},
+		'counts': dict(_counts),
+	}
+
+def write_summary(path):
+	with open(path, 'w') as f:
+		json.dump(summary(), f, indent='\t')
+
+def print_summary():
+	print('\nProfile')
+	print('\t{:<20} {:>6} {:>10} {:>10}'.format('Phase', 'Calls', 'Total', 'Self'))
+	for name, entry in _phases.items():
+		print('\t{:<20} {:>6} {:>9.3f}s {:>9.3f}s'.format(
+			name,
+			entry['calls'],
+			entry['seconds'],
+			entry['self seconds'],
+		))
+
+	for name, value in _counts.items():
+		print('\t{:<20} {:>6}'.format(name, value))
@@ -1,33 +1,51 @@
 #!/usr/bin/python3
 import argparse
-import config
-import importlib 
-
-SUB_PROGRAMS = [
-	'aggregate_data',
-	'calculate_qca',
-	'initialize',
-	'generate',
-	'report',
-	'take_attendance',
-	'update_roster',
-]
+import profiling
+import subcommands
 
 if __name__ == '__main__':
-	config.load_configuration()
-
 	parser = argparse.ArgumentParser()
+	parser.add_argument('--no-cache',
+		action='store_true',
+		help='Parse every grade file instead of using the gradebook cache.'
+	)
+	parser.add_argument('--profile',
+		nargs='?',
+		const='profile.json',
+		default=None,
+		metavar='JSON_PATH',
+		help='Time each phase of the run and write a summary (default profile.json).'
+	)
+	parser.add_argument('--cprofile',
+		default=None,
+		metavar='STATS_PATH',
+		help='Also run the subprogram under cProfile and dump the statistics.'
+	)
 
 	subparsers = parser.add_subparsers()
-	for module_name in SUB_PROGRAMS:
-		module = importlib.import_module(module_name)
-		module.add_parser(subparsers)
+	subcommands.add_parsers(subparsers)
 
 	args = parser.parse_args()
 
-	f = getattr(args, 'func', None)
+	if args.no_cache:
+		import gradebook_cache
+		gradebook_cache.disable()
+
+	if args.profile:
+		profiling.enable()
+
+	f = subcommands.get_function(args)
 
 	if f is None:
 		print('No target subprogram selected.')
+	elif args.cprofile:
+		import cProfile
+		profiler = cProfile.Profile()
+		profiler.runcall(f, args)
+		profiler.dump_stats(args.cprofile)
 	else:
 		f(args)
+
+	if args.profile:
+		profiling.print_summary()
+		profiling.write_summary(args.profile)
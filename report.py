@@ -1,30 +1,29 @@
-import config
-from csv_io import write_dataset, load_csv_as_dict
-from gradebook import get_all_students, get_categorized_gradebook
-from grading import calculate_semester_grade, calculate_student_letter_grade
-
-def add_parser(subparsers):
-	parser = subparsers.add_parser('report')
-	parser.add_argument('-forcenames', action='store_true')
-	parser.set_defaults(func=build_report)
-
-def build_report(args):
-	students = get_all_students()
-	students = list(filter(lambda x: x.status in ['Active', 'Withdrawn'], students))
-
-	gradebook = get_categorized_gradebook()
+import attendance
+from csv_io import write_dataset
+from gradebook import get_roster, get_categorized_gradebook
+from grading import get_class_grades
+
+def build_report(args, gradebook=None):
+	students = get_roster().with_status('Active', 'Withdrawn')
+
+	if gradebook is None:
+		gradebook = get_categorized_gradebook()
+	class_grades = get_class_grades(
+		gradebook,
+		[s for s in students if s.status != 'Withdrawn']
+	)
 	attendance_record = get_attendance_record()
 
 	dataset = []
 
 	for student in students:
-		dataset.append(gather_report_data(student, gradebook, attendance_record, args.forcenames))
+		dataset.append(gather_report_data(student, class_grades, attendance_record, args.forcenames))
 	
 	sorted_dataset = sort_dataset_with_scores(dataset)
 
 	write_dataset('generated/report.csv', sorted_dataset)
 
-def gather_report_data(student, gradebook, attendance_record, include_name):
+def gather_report_data(student, class_grades, attendance_record, include_name):
 	student_data = dict()
 	student_data['ID'] = student.student_id
 	student_data['Major'] = student.major
@@ -36,9 +35,9 @@ def gather_report_data(student, gradebook, attendance_record, include_name):
 		student_data['Absences'] = ''
 		student_data['Score'] = -1
 	else:
-		student_data['Grade'] = calculate_student_letter_grade(student, gradebook)
-		student_data['Absences'] = len(attendance_record.get(student.student_id, list()))
-		student_data['Score'] = calculate_semester_grade(student, gradebook)
+		student_data['Grade'] = class_grades.letter_grade(student)
+		student_data['Absences'] = len(attendance_record.absences(student.student_id))
+		student_data['Score'] = class_grades.semester_grade(student)
 	
 	return student_data
 
@@ -51,4 +50,4 @@ def sort_dataset_with_scores(dataset):
 	return sorted_data
 
 def get_attendance_record():
-	return load_csv_as_dict(config.ATTENDANCE_PATH)
+	return attendance.load_attendance()
@@ -0,0 +1,286 @@
+'''
+module rollup
+
+Department level statistics over many sections: the QCA, the distribution of
+semester and letter grades, and the average of every assignment.
+
+Each section is graded in a worker process (see batch.run_sections), which
+feeds the semester grade of every active student and every score into a
+Rollup, then hands back only that: running means and variances (Welford's
+method), letter counts and a fixed size histogram of grades for the quantiles.
+The Rollups of the sections are merged one at a time as they come back, so
+memory does not grow with the number of sections or students, and no more
+than one gradebook per worker is ever loaded.
+'''
+import batch
+import config
+import csv_io
+import gradebook
+import gradebook_cache
+import grading
+
+import array
+import contextlib
+import io
+import math
+
+QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+def build_rollup(args):
+	'''
+	The entry point.
+	'''
+	config_paths = batch.find_config_paths(args.sections)
+	if not config_paths:
+		print('No section configurations found.')
+		return
+
+	workers = batch.get_worker_count(args.workers, config_paths)
+	print('Rolling up {} sections with {} workers'.format(len(config_paths), workers))
+
+	rollup = Rollup()
+	for path, section_rollup, error in batch.run_sections(config_paths, workers, rollup_section, gradebook_cache.ENABLED):
+		if error is None:
+			rollup.merge(section_rollup)
+		else:
+			rollup.failed_sections.append(path)
+
+	if not rollup.grades.count:
+		print('No students were graded.')
+		exit(1)
+
+	print_rollup(rollup)
+
+	if args.output:
+		csv_io.write_dataset(args.output, build_rollup_rows(rollup))
+		print('\nStatistics written to {}'.format(args.output))
+
+	if rollup.failed_sections:
+		exit(1)
+
+class RunningStatistics(object):
+	'''
+	The count, mean, variance, minimum and maximum of a stream of values,
+	updated one value at a time with Welford's method. Two of them are
+	combined with the pairwise formula of Chan, Golub and LeVeque, so
+	statistics gathered separately can be merged without their values.
+	'''
+
+	def __init__(self):
+		self.count = 0
+		self.mean = 0.0
+		self.m2 = 0.0
+		self.minimum = math.inf
+		self.maximum = -math.inf
+
+	def add(self, value):
+		self.count += 1
+		delta = value - self.mean
+		self.mean += delta / self.count
+		self.m2 += delta * (value - self.mean)
+		self.minimum = min(self.minimum, value)
+		self.maximum = max(self.maximum, value)
+
+	def merge(self, other):
+		if not other.count:
+			return
+
+		count = self.count + other.count
+		delta = other.mean - self.mean
+		self.mean += delta * other.count / count
+		self.m2 += other.m2 + delta * delta * self.count * other.count / count
+		self.count = count
+		self.minimum = min(self.minimum, other.minimum)
+		self.maximum = max(self.maximum, other.maximum)
+
+	def variance(self):
+		'''
+		The sample variance, or 0 for fewer than two values.
+		'''
+		if self.count < 2:
+			return 0.0
+
+		return self.m2 / (self.count - 1)
+
+	def standard_deviation(self):
+		return math.sqrt(self.variance())
+
+class QuantileSketch(object):
+	'''
+	Approximate quantiles of grades from a histogram of BINS equal bins over
+	[0, UPPER). Grades outside that range are counted in the first or last
+	bin. A quantile is reported at the middle of its bin, so it is off by at
+	most half a bin, 0.05% of a grade.
+	'''
+	BINS = 1500
+	UPPER = 1.5
+
+	def __init__(self):
+		self.counts = array.array('q', bytes(8 * self.BINS))
+		self.count = 0
+
+	def add(self, value):
+		position = int(value / self.UPPER * self.BINS)
+		self.counts[min(max(position, 0), self.BINS - 1)] += 1
+		self.count += 1
+
+	def merge(self, other):
+		for position, count in enumerate(other.counts):
+			if count:
+				self.counts[position] += count
+		self.count += other.count
+
+	def quantile(self, q):
+		target = q * self.count
+		seen = 0
+
+		for position, count in enumerate(self.counts):
+			seen += count
+			if count and seen >= target:
+				return (position + 0.5) * self.UPPER / self.BINS
+
+		return self.UPPER
+
+class Rollup(object):
+	'''
+	Everything gathered from the sections so far:
+
+		grades - RunningStatistics of the semester grades
+		qca - RunningStatistics of the quality points of the letter grades
+		quantiles - QuantileSketch of the semester grades
+		letters - maps each letter grade to the number of students given it
+		letter_values - maps each letter grade to its quality points
+		ungraded - the students whose grade reaches no cutoff, who have no
+		letter and are left out of the QCA
+		failed_sections - the configuration paths of the sections that could
+		not be graded
+		assignments - maps (category, assignment) to RunningStatistics of the
+		percentages on it
+	'''
+
+	def __init__(self):
+		self.sections = 0
+		self.grades = RunningStatistics()
+		self.qca = RunningStatistics()
+		self.quantiles = QuantileSketch()
+		self.letters = dict()
+		self.letter_values = dict()
+		self.ungraded = 0
+		self.assignments = dict()
+		self.failed_sections = []
+
+	def add_student(self, grade, letter, qca_value):
+		self.grades.add(grade)
+		self.quantiles.add(grade)
+
+		if letter is None:
+			self.ungraded += 1
+			return
+
+		self.qca.add(qca_value)
+		self.letters[letter] = self.letters.get(letter, 0) + 1
+		self.letter_values[letter] = qca_value
+
+	def get_assignment(self, category, assignment):
+		if (category, assignment) not in self.assignments:
+			self.assignments[category, assignment] = RunningStatistics()
+
+		return self.assignments[category, assignment]
+
+	def merge(self, other):
+		self.sections += other.sections
+		self.grades.merge(other.grades)
+		self.qca.merge(other.qca)
+		self.quantiles.merge(other.quantiles)
+
+		for letter, count in other.letters.items():
+			self.letters[letter] = self.letters.get(letter, 0) + count
+		self.letter_values.update(other.letter_values)
+		self.ungraded += other.ungraded
+		self.failed_sections.extend(other.failed_sections)
+
+		for (category, assignment), statistics in other.assignments.items():
+			self.get_assignment(category, assignment).merge(statistics)
+
+def rollup_section(config_path, use_cache=True):
+	'''
+	Grade a single section and gather its Rollup. Runs in a worker of the
+	pool, and what the section prints while loading is discarded.
+	'''
+	batch.load_section(config_path, use_cache)
+
+	with contextlib.redirect_stdout(io.StringIO()):
+		categorized_gradebook = gradebook.get_categorized_gradebook()
+		students = gradebook.get_active_students()
+		class_grades = grading.get_class_grades(categorized_gradebook, students)
+
+	rollup = Rollup()
+	rollup.sections = 1
+
+	for student in students:
+		letter = class_grades.letter_grade(student)
+		rollup.add_student(class_grades.semester_grade(student), letter, config.QCA_VALUES.get(letter, 0.0))
+
+	for category in categorized_gradebook:
+		points = class_grades.category_points(category)
+		for assignment, scores in categorized_gradebook[category].items():
+			statistics = rollup.get_assignment(category, assignment)
+			for student in students:
+				statistics.add(grading.score_points(scores.get(student.student_id)) / points[assignment])
+
+	return rollup
+
+def print_rollup(rollup):
+	grades = rollup.grades
+
+	print('\n{} students in {} sections'.format(grades.count, rollup.sections))
+	if rollup.failed_sections:
+		print('{} sections failed and are left out:'.format(len(rollup.failed_sections)))
+		for path in rollup.failed_sections:
+			print('\t{}'.format(path))
+	print('Department QCA: {:.3f}'.format(rollup.qca.mean))
+
+	print('\nSemester Grades')
+	print('\tMean {:>8.2%}  Standard deviation {:.2%}'.format(grades.mean, grades.standard_deviation()))
+	print('\tMin  {:>8.2%}  Max {:.2%}'.format(grades.minimum, grades.maximum))
+	for q in QUANTILES:
+		print('\t{:>3.0f}th percentile {:>8.2%}'.format(100 * q, rollup.quantiles.quantile(q)))
+
+	print('\nLetter Grade Distribution')
+	for letter in sorted(rollup.letters, key=lambda letter: (-rollup.letter_values[letter], letter)):
+		count = rollup.letters[letter]
+		print('{:<3}: {:>6} {:>7.2%}'.format(letter, count, count / grades.count))
+	if rollup.ungraded:
+		print('{:<3}: {:>6} {:>7.2%}'.format('-', rollup.ungraded, rollup.ungraded / grades.count))
+
+	category = None
+	for (assignment_category, assignment), statistics in sorted(rollup.assignments.items()):
+		if assignment_category != category:
+			category = assignment_category
+			print('\nCategory {}'.format(category))
+		print('\t{:>6.2f}% ±{:>6.2f}%  {}'.format(
+			100 * statistics.mean,
+			100 * statistics.standard_deviation(),
+			assignment,
+		))
+
+def build_rollup_rows(rollup):
+	'''
+	A row of statistics for the semester grades and for each assignment.
+	'''
+	def make_row(category, assignment, statistics):
+		return {
+			'Category': category,
+			'Assignment': assignment,
+			'Count': statistics.count,
+			'Mean': statistics.mean,
+			'Standard Deviation': statistics.standard_deviation(),
+			'Min': statistics.minimum,
+			'Max': statistics.maximum,
+		}
+
+	rows = [make_row('Semester', '', rollup.grades)]
+	for (category, assignment), statistics in sorted(rollup.assignments.items()):
+		rows.append(make_row(category, assignment, statistics))
+
+	return rows
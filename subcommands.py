@@ -0,0 +1,197 @@
+'''
+module subcommands
+
+The arguments of every subprogram, declared without importing the modules that
+implement them. Each parser records the module and function to run, and the
+module is only imported once its subprogram has been selected, so starting the
+program does not pay for loading every subprogram.
+'''
+import argparse
+import importlib
+
+def add_aggregate_parser(subparsers):
+	parser = subparsers.add_parser('aggregate')
+
+	parser.add_argument('-student', action='store_true', help='Flag to enable further statistics on a single student.')
+	parser.add_argument('-nowrite', action='store_true', help='Flag to disable generation of the aggregate file.')
+	parser.add_argument(
+		'-extrapolate',
+		dest='category',
+		default=None,
+		help='Flag to enable output columns of maximum minimum and expected grades. The average it taken from the supplied category.',
+	)
+
+	parser.set_defaults(target=('aggregate_data', 'aggregate_data'))
+
+def add_batch_parser(subparsers):
+	parser = subparsers.add_parser('batch')
+
+	parser.add_argument('sections',
+		nargs='+',
+		help='Configuration files of the sections, or directories holding a section or a section in each subdirectory.'
+	)
+	parser.add_argument('-run',
+		dest='commands',
+		action='append',
+		default=None,
+		choices=['aggregate', 'qca', 'report'],
+		help='Run this subprogram for every section (default all of them). May be repeated.'
+	)
+	parser.add_argument('-workers', type=int, default=None, help='Sections run at once (default the number of cores).')
+	parser.add_argument('-summary', default='BatchSummary.csv', help='Where to write the summary of every section.')
+
+	parser.set_defaults(target=('batch', 'run_batch'))
+
+def add_cache_parser(subparsers):
+	parser = subparsers.add_parser('cache')
+
+	parser.add_argument('action',
+		choices = ['rebuild', 'clear']
+	)
+
+	parser.set_defaults(target=('gradebook_cache', 'manage_cache'))
+
+'''
+The outputs the generate subprogram can write.
+'''
+GENERATE_ITEMS = ['attendance', 'canvas', 'new', 'wa']
+
+def add_database_parser(subparsers):
+	parser = subparsers.add_parser('database')
+
+	parser.add_argument('action',
+		choices = ['import', 'export'],
+		help='Copy the csv roster, attendance and grades into the SQLite database, or write them back out.'
+	)
+	parser.add_argument('-grades',
+		action='store_true',
+		help='Import only the grade files, keeping the roster and attendance in the database.'
+	)
+	parser.add_argument('-force',
+		action='store_true',
+		help='Necessary to replace the roster and attendance already in the database.'
+	)
+
+	parser.set_defaults(target=('database', 'manage_database'))
+
+def add_generate_parser(subparsers):
+	parser = subparsers.add_parser('generate')
+
+	parser.add_argument('item',
+		type=parse_generate_items,
+		metavar='{{{}}}'.format(','.join(GENERATE_ITEMS + ['all'])),
+		help='An output, a comma separated list of them, or all of them.'
+	)
+	parser.add_argument('-delta',
+		dest='delta',
+		action='store_const',
+		const='columns',
+		default=None,
+		help='Only put the Canvas assignments whose grades changed since the last export in the upload.'
+	)
+	parser.add_argument('-delta-rows',
+		dest='delta',
+		action='store_const',
+		const='rows',
+		help='Like -delta, and also only put the students whose grades changed in the upload.'
+	)
+
+	parser.set_defaults(target=('generate', 'generate_specific'))
+
+def parse_generate_items(value):
+	'''
+	Turn the item argument of generate into a list of outputs, in order and
+	without repeats.
+	'''
+	items = []
+
+	for item in value.split(','):
+		item = item.strip()
+		if item == 'all':
+			expanded = GENERATE_ITEMS
+		elif item in GENERATE_ITEMS:
+			expanded = [item]
+		else:
+			raise argparse.ArgumentTypeError('invalid choice: {!r} (choose from {})'.format(
+				item,
+				', '.join(GENERATE_ITEMS + ['all']),
+			))
+
+		items.extend(i for i in expanded if i not in items)
+
+	return items
+
+def add_init_parser(subparsers):
+	parser = subparsers.add_parser('init')
+	parser.add_argument('-force',
+		action='store_true',
+		help='Necessary to overwrite roster and attendance data.'
+	)
+
+	parser.set_defaults(target=('initialize', 'initialize_gradebook'))
+
+def add_qca_parser(subparsers):
+	parser = subparsers.add_parser('qca')
+	parser.add_argument('-verbose', action='store_true', default=False)
+	parser.set_defaults(target=('calculate_qca', 'calculate_class_qca'))
+
+def add_report_parser(subparsers):
+	parser = subparsers.add_parser('report')
+	parser.add_argument('-forcenames', action='store_true')
+	parser.set_defaults(target=('report', 'build_report'))
+
+def add_attendance_parser(subparsers):
+	parser = subparsers.add_parser('attendance')
+
+	parser.add_argument('-date', default=None)
+
+	parser.set_defaults(target=('take_attendance', 'update_attendance'))
+
+def add_rollup_parser(subparsers):
+	parser = subparsers.add_parser('rollup')
+
+	parser.add_argument('sections',
+		nargs='+',
+		help='Configuration files of the sections, or directories holding a section or a section in each subdirectory.'
+	)
+	parser.add_argument('-workers', type=int, default=None, help='Sections graded at once (default the number of cores).')
+	parser.add_argument('-output', default=None, help='Also write the grade and assignment statistics to this csv file.')
+
+	parser.set_defaults(target=('rollup', 'build_rollup'))
+
+def add_update_parser(subparsers):
+	parser = subparsers.add_parser('update')
+	parser.add_argument('-missing', default='Dropped', help='How to mark students that are no longer listed.')
+	parser.set_defaults(target=('update_roster', 'update_roster'))
+
+SUB_PROGRAMS = [
+	add_aggregate_parser,
+	add_qca_parser,
+	add_init_parser,
+	add_generate_parser,
+	add_batch_parser,
+	add_cache_parser,
+	add_database_parser,
+	add_report_parser,
+	add_rollup_parser,
+	add_attendance_parser,
+	add_update_parser,
+]
+
+def add_parsers(subparsers):
+	for add_parser in SUB_PROGRAMS:
+		add_parser(subparsers)
+
+def get_function(args):
+	'''
+	Import the module of the selected subprogram and return the function that
+	runs it, or None if no subprogram was selected.
+	'''
+	target = getattr(args, 'target', None)
+	if target is None:
+		return None
+
+	module_name, function_name = target
+	module = importlib.import_module(module_name)
+
+	return getattr(module, function_name)
@@ -1,16 +1,8 @@
 #!/usr/bin/python3
-import config
-import csv
+import attendance
 import datetime
 import gradebook
 
-def add_parser(subparsers):
-	parser = subparsers.add_parser('attendance')
-
-	parser.add_argument('-date', default=None)
-
-	parser.set_defaults(func=update_attendance)
-
 def get_date(args):
 	if args.date is None:
 		return datetime.datetime.now().date().isoformat()
@@ -21,12 +13,12 @@ def update_attendance(args):
 	'''
 	The entry point.
 	'''
-	record = load_record()
+	record = attendance.load_attendance()
 	date = get_date(args)
 
 	print('Marking record for {}'.format(date))
 
-	if date_recorded_before(record, date):
+	if record.date_recorded(date):
 		response = input('Date has been use to record. Continue? (Y/N) ')
 		if response.lower() != 'y':
 			print('Aborted')
@@ -43,34 +35,7 @@ def update_attendance(args):
 		print('Aborted')
 		return
 	
-	update_record(record, students_to_mark, date)
-	save_record(record)
-
-def load_record():
-	'''
-	Load the attendance record as a map to lists. The key of the map is the
-	student ID while the list is of the days absent.
-	'''
-	record = dict()
-
-	with open(config.ATTENDANCE_PATH, 'r') as f:
-		reader = csv.reader(f)
-		for row in reader:
-			key, data = row[0], row[1:]
-			record[key] = data
-	
-	return record
-
-def date_recorded_before(record, date):
-	'''
-	Check if the date is in any of the records.
-	'''
-
-	for id_string in record:
-		if date in record[id_string]:
-			return True
-	
-	return False
+	record.record_absences([s.student_id for s in students_to_mark], date)
 
 def get_absent_students():
 	'''
@@ -165,25 +130,5 @@ def filter_candidates(candidates, last_name, first_name):
 	
 	return result
 
-def update_record(record, students_to_mark, date):
-	'''
-	For each student listed, add this date to their record.
-	'''
-	for student in students_to_mark:
-		if not student.student_id in record:
-			record[student.student_id] = []
-		if not date in record[student.student_id]:
-			record[student.student_id].append(date)
-
-def save_record(record):
-	'''
-	Commit record to file.
-	'''
-	with open(config.ATTENDANCE_PATH, 'w') as f:
-		writer = csv.writer(f)
-		for id_string in record:
-			row = [id_string] + record[id_string]
-			writer.writerow(row)
-
 if __name__ == '__main__':
 	update_attendance()
@@ -0,0 +1,10 @@
+'''
+package tests
+
+Regression tests for the gradebook. Run them from the repository root with
+
+	python3 -m unittest discover tests
+
+or with pytest. Tests that need a course build a small synthetic one with
+benchmarks.synthetic in a temporary directory.
+'''
@@ -0,0 +1,57 @@
+'''
+module course
+
+Builds a synthetic course for a test and puts its configuration into effect.
+'''
+import config
+import gradebook
+from benchmarks import synthetic
+
+import contextlib
+import io
+import shutil
+import tempfile
+
+def make_course(test_case, students=30, assignments=5):
+	'''
+	Write a synthetic course to a temporary directory that is removed after
+	the test, load its configuration and return the path of its config.ini.
+	'''
+	base = tempfile.mkdtemp(prefix='gradebook-test-')
+	test_case.addCleanup(shutil.rmtree, base)
+
+	size = synthetic.CourseSize(
+		students=students,
+		assignments=assignments,
+		webassign=5,
+		attendance=10,
+	)
+	config_path = synthetic.generate_course(base, size)
+	load_course(config_path)
+
+	return config_path
+
+def load_course(config_path):
+	config.load_configuration(config_path)
+	gradebook.invalidate_roster()
+
+def set_storage(config_path, storage):
+	'''
+	Switch the storage of the course and load the changed configuration.
+	'''
+	with open(config_path, 'r') as f:
+		lines = f.readlines()
+
+	with open(config_path, 'w') as f:
+		for line in lines:
+			if line.startswith('storage ='):
+				line = 'storage = {}\n'.format(storage)
+			f.write(line)
+
+	load_course(config_path)
+
+def quietly():
+	'''
+	Discard what the enclosed block prints.
+	'''
+	return contextlib.redirect_stdout(io.StringIO())
@@ -0,0 +1,70 @@
+import attendance
+import config
+from tests import course
+
+import csv
+import os
+import unittest
+import unittest.mock
+
+class AttendanceRecordTest(unittest.TestCase):
+
+	def setUp(self):
+		course.make_course(self, students=5)
+		with open(config.ATTENDANCE_PATH, 'w') as f:
+			csv.writer(f).writerows([
+				['900000000', '2017-08-21', '2017-08-23'],
+				['900000001', '2017-08-23'],
+			])
+		self.record = attendance.load_attendance()
+
+	def read_record_file(self):
+		with open(config.ATTENDANCE_PATH, 'r') as f:
+			return [row for row in csv.reader(f) if row]
+
+	def test_lookups(self):
+		self.assertEqual(self.record.absences('900000000'), ['2017-08-21', '2017-08-23'])
+		self.assertEqual(self.record.absent_students('2017-08-23'), {'900000000', '900000001'})
+		self.assertTrue(self.record.date_recorded('2017-08-21'))
+		self.assertFalse(self.record.date_recorded('2017-08-25'))
+
+	def test_new_absences_are_journaled(self):
+		before = self.read_record_file()
+		self.record.record_absences(['900000002', '900000000'], '2017-08-25')
+		self.record.record_absences(['900000002'], '2017-08-25')
+
+		self.assertEqual(self.read_record_file(), before)
+		self.assertEqual(self.record.journal.read(), [
+			['900000002', '2017-08-25'],
+			['900000000', '2017-08-25'],
+		])
+
+		record = attendance.load_attendance()
+		self.assertEqual(record.absent_students('2017-08-25'), {'900000000', '900000002'})
+		self.assertEqual(record.journal_entries, 2)
+
+	def test_journal_is_compacted(self):
+		journal = self.record.journal
+		compact_in_background = journal.compact_in_background
+		threads = []
+
+		def start_compaction(*arguments):
+			threads.append(compact_in_background(*arguments))
+
+		with unittest.mock.patch.object(attendance, 'COMPACT_ENTRIES', 3), \
+				unittest.mock.patch.object(journal, 'compact_in_background', side_effect=start_compaction):
+			self.record.record_absences(['900000002', '900000003'], '2017-08-25')
+			self.assertEqual(threads, [])
+			self.record.record_absences(['900000004'], '2017-08-25')
+
+		self.assertEqual(len(threads), 1)
+		threads[0].join()
+		self.assertFalse(os.path.exists(self.record.journal.path))
+		self.assertIn(['900000004', '2017-08-25'], self.read_record_file())
+		self.assertEqual(
+			attendance.load_attendance().absent_students('2017-08-25'),
+			{'900000002', '900000003', '900000004'},
+		)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,38 @@
+import batch
+import config
+import gradebook
+import grading
+from tests import course
+
+import os
+import shutil
+import unittest
+import unittest.mock
+
+class RunSectionTest(unittest.TestCase):
+
+	def setUp(self):
+		self.addCleanup(os.chdir, os.getcwd())
+		self.config_path = course.make_course(self, students=10)
+
+	def test_gradebook_is_loaded_and_graded_once(self):
+		with unittest.mock.patch.object(gradebook, 'get_categorized_gradebook', wraps=gradebook.get_categorized_gradebook) as load, \
+				unittest.mock.patch.object(grading, 'ClassGrades', wraps=grading.ClassGrades) as grade:
+			summary = batch.run_section(self.config_path, batch.BATCH_COMMANDS)
+
+		self.assertEqual(load.call_count, 1)
+		self.assertEqual(grade.call_count, 1)
+		self.assertEqual(summary['Students'], 10)
+		self.assertTrue(os.path.exists(batch.get_log_path()))
+
+	def test_log_failure_keeps_section_error(self):
+		batch.load_section(self.config_path)
+		shutil.rmtree(config.OUTPUT_DIR)
+
+		with course.quietly(), self.assertRaises(FileNotFoundError) as raised:
+			batch.run_section(self.config_path, ['aggregate'])
+
+		self.assertIn('StudentScores.csv', str(raised.exception))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,70 @@
+import config
+import generate_canvas_gradebook
+import gradebook
+from tests import course
+
+import csv
+import os
+import unittest
+
+class CanvasUploadTest(unittest.TestCase):
+
+	def setUp(self):
+		course.make_course(self, students=10)
+
+	def export(self, delta=None):
+		with course.quietly():
+			generate_canvas_gradebook.prepare_canvas_gradebook(delta=delta)
+
+		with open(config.OUTPUT_CANVAS_PATH, 'r') as f:
+			rows = list(csv.reader(f))
+
+		header = next(h for h in rows[0] if h.startswith('Homework 1 ('))
+		column = rows[0].index(header)
+		return {row[2]: row[column] for row in rows[2:]}
+
+	def clear_homework_grade(self):
+		'''
+		Blank the first graded score of Homework 1 and return the student's id.
+		'''
+		path = os.path.join(config.GRADES_DIR, 'homework', 'Homework 1.csv')
+		with open(path, 'r') as f:
+			rows = list(csv.reader(f))
+
+		row = next(row for row in rows[1:] if row[2])
+		row[2] = ''
+		with open(path, 'w') as f:
+			csv.writer(f).writerows(rows)
+		stat = os.stat(path)
+		os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+		return row[0]
+
+	def test_cleared_grade_in_full_and_delta_exports(self):
+		for delta in [None, 'columns', 'rows']:
+			with self.subTest(delta=delta):
+				self.export()
+				student_id = self.clear_homework_grade()
+				gradebook.invalidate_roster()
+
+				upload = self.export(delta)
+				self.assertEqual(upload[student_id], generate_canvas_gradebook.CLEARED_GRADE)
+
+	def test_blank_grade_stays_blank(self):
+		upload = self.export()
+		blank = [student_id for student_id, text in upload.items() if text == '']
+
+		self.assertEqual([student_id for student_id in blank if self.export()[student_id] != ''], [])
+
+	def test_mark_cleared_grades(self):
+		grades = {'A': {'1': '', '2': '', '3': '5'}}
+		previous = {'A': {'1': '4', '2': ''}}
+
+		self.assertEqual(
+			generate_canvas_gradebook.mark_cleared_grades(grades, ['A'], previous),
+			{'A': {'1': generate_canvas_gradebook.CLEARED_GRADE, '2': '', '3': '5'}},
+		)
+		self.assertEqual(grades['A']['1'], '')
+
+if __name__ == '__main__':
+	unittest.main()
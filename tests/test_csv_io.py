@@ -0,0 +1,112 @@
+import csv_io
+
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+class CsvIoTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp(prefix='gradebook-test-')
+		self.addCleanup(shutil.rmtree, self.directory)
+
+	def path(self, name):
+		return os.path.join(self.directory, name)
+
+	def read_rows(self, path):
+		with open(path, 'r') as f:
+			return list(csv.reader(f))
+
+class JournalTest(CsvIoTest):
+
+	def setUp(self):
+		super().setUp()
+		self.journal = csv_io.Journal(self.path('Record.csv' + csv_io.JOURNAL_SUFFIX))
+
+	def test_empty(self):
+		self.assertEqual(self.journal.read(), [])
+		self.assertIsNone(self.journal.signature())
+
+	def test_append_and_read(self):
+		self.journal.append([['900000001', 'Active']])
+		signature = self.journal.signature()
+		self.journal.append([['900000002', 'Dropped'], ['900000001', 'Dropped']])
+
+		self.assertEqual(self.journal.read(), [
+			['900000001', 'Active'],
+			['900000002', 'Dropped'],
+			['900000001', 'Dropped'],
+		])
+		self.assertNotEqual(self.journal.signature(), signature)
+
+	def test_compact(self):
+		record_path = self.path('Record.csv')
+		self.journal.append([['900000001', 'Dropped']])
+
+		self.journal.compact(record_path, [['Student ID', 'Status'], ['900000001', 'Dropped']])
+
+		self.assertEqual(self.read_rows(record_path), [['Student ID', 'Status'], ['900000001', 'Dropped']])
+		self.assertEqual(self.journal.read(), [])
+		self.assertIsNone(self.journal.signature())
+		self.assertFalse(os.path.exists(record_path + '.tmp'))
+
+	def test_compact_in_background(self):
+		record_path = self.path('Record.csv')
+		rows = [['Student ID', 'Status']]
+		self.journal.append([['900000001', 'Dropped']])
+
+		with csv_io.storage_lock:
+			thread = self.journal.compact_in_background(record_path, lambda: list(rows))
+			rows.append(['900000001', 'Dropped'])
+		thread.join()
+
+		self.assertEqual(self.read_rows(record_path), rows)
+		self.assertEqual(self.journal.read(), [])
+
+	def test_append_waits_for_storage_lock(self):
+		appended = threading.Event()
+		thread = threading.Thread(target=lambda: (self.journal.append([['900000001']]), appended.set()))
+
+		with csv_io.storage_lock:
+			thread.start()
+			self.assertFalse(appended.wait(0.2))
+			self.assertEqual(self.journal.read(), [])
+
+		thread.join()
+		self.assertEqual(self.journal.read(), [['900000001']])
+
+class AtomicWriterTest(CsvIoTest):
+
+	def test_replaces_file(self):
+		path = self.path('Record.csv')
+		csv_io.write_rows(path, [['old']])
+		csv_io.write_rows(path, [['new']])
+
+		self.assertEqual(self.read_rows(path), [['new']])
+		self.assertEqual(os.listdir(self.directory), ['Record.csv'])
+
+	def test_failed_write_keeps_original(self):
+		path = self.path('Record.csv')
+		csv_io.write_rows(path, [['old']])
+
+		with self.assertRaises(ValueError):
+			with csv_io.atomic_writer(path) as f:
+				f.write('new\n')
+				raise ValueError()
+
+		self.assertEqual(self.read_rows(path), [['old']])
+		self.assertEqual(os.listdir(self.directory), ['Record.csv'])
+
+	def test_error_raised_when_temporary_file_is_gone(self):
+		path = self.path('Record.csv')
+
+		with self.assertRaises(ValueError):
+			with csv_io.atomic_writer(path):
+				os.remove(path + '.tmp')
+				raise ValueError()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,122 @@
+import attendance
+import config
+import database
+import gradebook
+import grading
+from tests import course
+
+import argparse
+import csv
+import glob
+import os
+import shutil
+import unittest
+
+class DatabaseTest(unittest.TestCase):
+
+	def setUp(self):
+		self.config_path = course.make_course(self)
+
+	def read_local_files(self):
+		'''
+		The parsed rows of the roster, the attendance record and every grade
+		file, by path.
+		'''
+		paths = [config.ROSTER_PATH, config.ATTENDANCE_PATH]
+		paths += sorted(glob.glob(os.path.join(config.GRADES_DIR, '*', '*.csv')))
+
+		files = dict()
+		for path in paths:
+			with open(path, 'r') as f:
+				files[path] = [row for row in csv.reader(f) if row]
+
+		return files
+
+	def semester_grades(self):
+		with course.quietly():
+			students = gradebook.get_active_students()
+			class_grades = grading.get_class_grades(gradebook.get_categorized_gradebook(), students)
+
+		return {s.student_id: class_grades.semester_grade(s) for s in students}
+
+	def test_import_export_round_trip(self):
+		original = self.read_local_files()
+
+		with course.quietly():
+			database.import_csv()
+			database.export_csv()
+
+		self.assertEqual(self.read_local_files(), original)
+
+	def test_sqlite_storage_grades_match_csv(self):
+		expected = self.semester_grades()
+
+		with course.quietly():
+			database.import_csv()
+		course.set_storage(self.config_path, 'sqlite')
+		self.assertEqual(config.STORAGE, 'sqlite')
+
+		grades = self.semester_grades()
+		self.assertEqual(grades.keys(), expected.keys())
+		for student_id, grade in expected.items():
+			self.assertAlmostEqual(grades[student_id], grade, places=12)
+
+	def test_sqlite_saves_go_to_the_database(self):
+		with course.quietly():
+			database.import_csv()
+		course.set_storage(self.config_path, 'sqlite')
+		roster_file = self.read_local_files()[config.ROSTER_PATH]
+
+		student = gradebook.get_roster().all_students()[0]
+		row = student.to_row()
+		row[gradebook.Student.keys.index('Status')] = 'Dropped'
+		gradebook.get_roster().save_changes([gradebook.Student.from_row(row)])
+		attendance.load_attendance().record_absences([student.student_id], '2030-01-01')
+
+		self.assertEqual(self.status(student.student_id), 'Dropped')
+		self.assertIn((student.student_id, '2030-01-01'), database.load_absences())
+		self.assertEqual(self.read_local_files()[config.ROSTER_PATH], roster_file)
+
+		gradebook.invalidate_roster()
+		self.assertNotIn(student.student_id, [s.student_id for s in gradebook.get_active_students()])
+		self.assertTrue(attendance.load_attendance().date_recorded('2030-01-01'))
+
+	def import_database(self, grades=False, force=False):
+		with course.quietly():
+			database.manage_database(argparse.Namespace(action='import', grades=grades, force=force))
+
+	def drop_first_student(self):
+		student = database.load_students()[0]
+		student.status = 'Dropped'
+		database.save_students([student])
+
+		return student.student_id
+
+	def status(self, student_id):
+		return {s.student_id: s.status for s in database.load_students()}[student_id]
+
+	def test_import_keeps_records_without_force(self):
+		self.import_database()
+		student_id = self.drop_first_student()
+
+		self.import_database()
+		self.assertEqual(self.status(student_id), 'Dropped')
+
+		self.import_database(force=True)
+		self.assertEqual(self.status(student_id), 'Active')
+
+	def test_import_grades_keeps_roster(self):
+		self.import_database()
+		student_id = self.drop_first_student()
+
+		homework = os.path.join(config.GRADES_DIR, 'homework')
+		shutil.copy(os.path.join(homework, 'Homework 1.csv'), os.path.join(homework, 'Homework 9.csv'))
+		self.import_database(grades=True)
+
+		names = [assignment.name for assignment, _ in database.load_categorized_scores()['homework']]
+		self.assertIn('Homework 9', names)
+		self.assertEqual(len(names), len(set(names)))
+		self.assertEqual(self.status(student_id), 'Dropped')
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,53 @@
+import config
+import grading
+from tests import course
+
+import unittest
+import unittest.mock
+
+class DropPolicyTest(unittest.TestCase):
+
+	def test_drops_lowest(self):
+		self.assertEqual(grading.DropPolicy({'drops': 1}).drop_count(5), 1)
+
+	def test_keep_best(self):
+		self.assertEqual(grading.DropPolicy({'keep': 2}).drop_count(5), 3)
+		self.assertIsNone(grading.DropPolicy({'keep': 2}).depth)
+
+	def test_minimum_limits_drops(self):
+		self.assertEqual(grading.DropPolicy({'drops': 3, 'minimum': 3}).drop_count(4), 1)
+
+	def test_never_drops_every_score(self):
+		self.assertEqual(grading.DropPolicy({'drops': 5, 'minimum': 0}).drop_count(3), 2)
+		self.assertEqual(grading.DropPolicy({'keep': 0}).drop_count(3), 2)
+		self.assertEqual(grading.DropPolicy({'drops': 1}).drop_count(1), 0)
+
+	def test_grade_with_minimum_of_zero(self):
+		totals = grading.CategoryTotals({'weight': 1.0, 'drops': 5, 'minimum': 0})
+		assignments = {'A': {'s': 2.0}, 'B': {'s': 4.0}}
+		points = {'A': 4.0, 'B': 4.0}
+
+		totals.add_students(['s'], assignments, points)
+
+		self.assertEqual(totals.grade('s'), 1.0)
+
+	def test_grade_keeps_best(self):
+		totals = grading.CategoryTotals({'weight': 1.0, 'keep': 2})
+		assignments = {'A': {'s': 1.0}, 'B': {'s': 4.0}, 'C': {'s': 3.0}}
+		points = {'A': 4.0, 'B': 4.0, 'C': 4.0}
+
+		totals.add_students(['s'], assignments, points)
+
+		self.assertEqual(totals.grade('s'), 0.875)
+
+	def test_rejected_settings(self):
+		course.make_course(self, students=1)
+
+		for settings in [{'minimum': 0}, {'keep': 0}, {'drops': -1}]:
+			weights = {'homework': dict({'weight': 1.0, 'equally_scored': 10.0}, **settings)}
+			with self.subTest(settings=settings), unittest.mock.patch.object(config, 'GRADE_WEIGHTS', weights, create=True):
+				with course.quietly(), self.assertRaises(SystemExit):
+					grading.verify_gradebook_weights({'homework': {}})
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,43 @@
+import generate
+import subcommands
+from tests import course
+
+import argparse
+import contextlib
+import io
+import unittest
+
+class GenerateTest(unittest.TestCase):
+
+	def setUp(self):
+		course.make_course(self, students=10)
+
+	def test_concurrent_outputs_print_in_order(self):
+		parser = argparse.ArgumentParser()
+		subcommands.add_parsers(parser.add_subparsers())
+		args = parser.parse_args(['generate', 'all'])
+
+		output = io.StringIO()
+		with contextlib.redirect_stdout(output):
+			generate.generate_specific(args)
+
+		statuses = [line for line in output.getvalue().splitlines() if 'Performing generation' in line]
+		self.assertEqual(statuses, [
+			'Performing generation of type {}'.format(item)
+			for item in subcommands.GENERATE_ITEMS
+		])
+
+	def test_thread_output_keeps_outputs_apart(self):
+		stdout = io.StringIO()
+		output = generate.ThreadOutput(stdout)
+
+		with contextlib.redirect_stdout(output):
+			output.collect('a', print, 'from a')
+			print('not collected')
+
+		self.assertEqual(output.text('a'), 'from a\n')
+		self.assertEqual(output.text('b'), '')
+		self.assertEqual(stdout.getvalue(), 'not collected\n')
+
+if __name__ == '__main__':
+	unittest.main()
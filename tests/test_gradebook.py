@@ -0,0 +1,48 @@
+import gradebook
+
+import unittest
+
+def make_assignment(category, name, points=None):
+	return gradebook.Assignment(category, name, points, dict())
+
+class GradebookTest(unittest.TestCase):
+
+	def setUp(self):
+		self.gradebook = gradebook.Gradebook({
+			'homework': [
+				(make_assignment('homework', 'Homework 1'), {'a': 1.0, 'b': 2.0}),
+				(make_assignment('homework', 'Homework 2'), {'b': 4.0, 'c': 5.0}),
+			],
+			'tests': [
+				(make_assignment('tests', 'Midterm', 100.0), {'a': 90.0}),
+			],
+		})
+
+	def test_nested_lookup(self):
+		self.assertEqual(self.gradebook['homework']['Homework 2']['c'], 5.0)
+		self.assertEqual(list(self.gradebook['homework']), ['Homework 1', 'Homework 2'])
+		self.assertEqual(self.gradebook['tests']['Midterm'].points, 100.0)
+
+	def test_unlisted_student_is_absent(self):
+		column = self.gradebook['homework']['Homework 1']
+
+		self.assertNotIn('c', column)
+		self.assertIsNone(column.get('c'))
+		with self.assertRaises(KeyError):
+			column['c']
+		self.assertEqual(column.keys(), ['a', 'b'])
+
+	def test_category_slice(self):
+		rows = self.gradebook.row_count
+		scores = self.gradebook.category_slice('homework')
+
+		self.assertEqual(len(scores), 2 * rows)
+		for offset, name in enumerate(self.gradebook['homework']):
+			column = self.gradebook['homework'][name]
+			for student_id, score in column.items():
+				self.assertEqual(scores[offset * rows + self.gradebook.students.find(student_id)], score)
+
+		self.assertEqual(list(self.gradebook.category_slice('tests')[:1]), [90.0])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,99 @@
+import config
+import gradebook
+import grading
+from tests import course
+
+import csv
+import os
+import unittest
+
+def reference_semester_grade(categorized_gradebook, student):
+	'''
+	The semester grade as the original per student functions computed it:
+	every percentage of every category recalculated from the points of the
+	assignment, with the lowest ones removed one at a time.
+	'''
+	score = 0.0
+	weight_sum = 0.0
+
+	for category in categorized_gradebook:
+		settings = config.GRADE_WEIGHTS[category]
+		percentages = []
+		for assignment, scores in categorized_gradebook[category].items():
+			points = scores.points
+			if points is None:
+				points = settings.get('equally_scored') or settings[assignment]
+			percentages.append(grading.score_points(scores.get(student.student_id)) / points)
+
+		for _ in range(settings.get('drops') or 0):
+			percentages.remove(min(percentages))
+
+		score += settings['weight'] * sum(percentages) / len(percentages)
+		weight_sum += settings['weight']
+
+	return score / weight_sum
+
+def reference_letter_grade(score):
+	for letter, cutoff in config.GRADE_CUTOFFS:
+		if score >= cutoff:
+			return letter
+
+	return None
+
+class GradingEquivalenceTest(unittest.TestCase):
+
+	def setUp(self):
+		self.config_path = course.make_course(self)
+
+	def grade(self):
+		with course.quietly():
+			categorized_gradebook = gradebook.get_categorized_gradebook()
+			students = gradebook.get_active_students()
+			class_grades = grading.get_class_grades(categorized_gradebook, students)
+
+		return categorized_gradebook, students, class_grades
+
+	def assert_matches_reference(self):
+		categorized_gradebook, students, class_grades = self.grade()
+		self.assertTrue(students)
+
+		for student in students:
+			expected = reference_semester_grade(categorized_gradebook, student)
+			self.assertAlmostEqual(class_grades.semester_grade(student), expected, places=12)
+			self.assertEqual(class_grades.letter_grade(student), reference_letter_grade(expected))
+
+	def test_matches_reference(self):
+		self.assert_matches_reference()
+
+	def test_cached_totals_match_reference(self):
+		self.assert_matches_reference()
+		self.assert_matches_reference()
+
+	def test_changed_grade_file_is_regraded(self):
+		self.assert_matches_reference()
+
+		path = os.path.join(config.GRADES_DIR, 'homework', 'Homework 1.csv')
+		with open(path, 'r') as f:
+			rows = list(csv.reader(f))
+		for row in rows[1:]:
+			row[2] = '10'
+		with open(path, 'w') as f:
+			csv.writer(f).writerows(rows)
+		stat = os.stat(path)
+		os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+		self.assert_matches_reference()
+
+	def test_student_missing_from_a_file_scores_zero(self):
+		path = os.path.join(config.GRADES_DIR, 'homework', 'Homework 2.csv')
+		with open(path, 'r') as f:
+			rows = list(csv.reader(f))
+		with open(path, 'w') as f:
+			csv.writer(f).writerows(rows[:1] + rows[2:])
+
+		categorized_gradebook, students, class_grades = self.grade()
+		column = class_grades.column('homework', 'Homework 2')
+		self.assertEqual(column[class_grades.rows[rows[1][0]]], 0.0)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,75 @@
+import csv_io
+import profiling
+
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+class ProfiledTest(unittest.TestCase):
+	'''
+	Runs with profiling enabled, and leaves no phases or counts behind.
+	'''
+
+	def setUp(self):
+		patches = [
+			unittest.mock.patch.object(profiling, 'ENABLED', True),
+			unittest.mock.patch.dict(profiling._phases, clear=True),
+			unittest.mock.patch.dict(profiling._counts, clear=True),
+		]
+		for patch in patches:
+			patch.start()
+			self.addCleanup(patch.stop)
+
+class ProfilingTest(ProfiledTest):
+
+	def test_timed_phases(self):
+		@profiling.timed('inner')
+		def inner():
+			pass
+
+		@profiling.timed('outer')
+		def outer():
+			inner()
+			inner()
+
+		outer()
+		phases = profiling.summary()['phases']
+
+		self.assertEqual(phases['outer']['calls'], 1)
+		self.assertEqual(phases['inner']['calls'], 2)
+		self.assertLessEqual(phases['outer']['self seconds'], phases['outer']['seconds'])
+
+	def test_counts_only_when_enabled(self):
+		profiling.count('rows', 3)
+		profiling.count('rows')
+		with unittest.mock.patch.object(profiling, 'ENABLED', False):
+			profiling.count('rows', 10)
+
+		self.assertEqual(profiling.summary()['counts'], {'rows': 4})
+
+class WriteDatasetTest(ProfiledTest):
+
+	def setUp(self):
+		super().setUp()
+		self.directory = tempfile.mkdtemp(prefix='gradebook-test-')
+		self.addCleanup(shutil.rmtree, self.directory)
+
+	def test_generator(self):
+		path = os.path.join(self.directory, 'Dataset.csv')
+		csv_io.write_dataset(path, ({'Student ID': i, 'Score': 2 * i} for i in range(3)))
+
+		with open(path, 'r') as f:
+			rows = list(csv.reader(f))
+
+		self.assertEqual(rows, [
+			['Student ID', 'Score'],
+			['0', '0'],
+			['1', '2'],
+			['2', '4'],
+		])
+
+if __name__ == '__main__':
+	unittest.main()
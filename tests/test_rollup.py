@@ -0,0 +1,85 @@
+import gradebook
+import grading
+import rollup
+from tests import course
+
+import os
+import statistics
+import unittest
+
+class RunningStatisticsTest(unittest.TestCase):
+
+	def test_merge_matches_statistics(self):
+		values = [0.5, 0.92, 0.71, 0.88, 1.04, 0.3, 0.67]
+
+		first = rollup.RunningStatistics()
+		second = rollup.RunningStatistics()
+		for value in values[:3]:
+			first.add(value)
+		for value in values[3:]:
+			second.add(value)
+		first.merge(second)
+		first.merge(rollup.RunningStatistics())
+
+		self.assertEqual(first.count, len(values))
+		self.assertAlmostEqual(first.mean, statistics.mean(values), places=12)
+		self.assertAlmostEqual(first.variance(), statistics.variance(values), places=12)
+		self.assertEqual(first.minimum, min(values))
+		self.assertEqual(first.maximum, max(values))
+
+	def test_single_value_has_no_variance(self):
+		running = rollup.RunningStatistics()
+		running.add(0.8)
+
+		self.assertEqual(running.variance(), 0.0)
+
+class QuantileSketchTest(unittest.TestCase):
+
+	def test_median_within_half_a_bin(self):
+		sketch = rollup.QuantileSketch()
+		for i in range(101):
+			sketch.add(i / 100)
+
+		half_bin = sketch.UPPER / sketch.BINS / 2
+		self.assertAlmostEqual(sketch.quantile(0.5), 0.5, delta=half_bin + 1e-12)
+
+class RollupTest(unittest.TestCase):
+
+	def test_merge(self):
+		first = rollup.Rollup()
+		first.sections = 1
+		first.add_student(0.95, 'A', 4.0)
+		first.add_student(0.1, None, 0.0)
+
+		second = rollup.Rollup()
+		second.sections = 1
+		second.add_student(0.85, 'B', 3.0)
+		second.add_student(0.97, 'A', 4.0)
+		second.failed_sections.append('other/config.ini')
+
+		first.merge(second)
+
+		self.assertEqual(first.sections, 2)
+		self.assertEqual(first.grades.count, 4)
+		self.assertEqual(first.letters, {'A': 2, 'B': 1})
+		self.assertEqual(first.ungraded, 1)
+		self.assertAlmostEqual(first.qca.mean, 11.0 / 3)
+		self.assertEqual(first.failed_sections, ['other/config.ini'])
+
+	def test_section_matches_class_grades(self):
+		self.addCleanup(os.chdir, os.getcwd())
+		config_path = course.make_course(self, students=20)
+
+		section = rollup.rollup_section(config_path)
+
+		with course.quietly():
+			students = gradebook.get_active_students()
+			class_grades = grading.get_class_grades(gradebook.get_categorized_gradebook(), students)
+
+		self.assertEqual(section.sections, 1)
+		self.assertEqual(section.grades.count, len(students))
+		self.assertAlmostEqual(section.grades.mean, class_grades.class_average(), places=12)
+		self.assertEqual(sum(section.letters.values()) + section.ungraded, len(students))
+
+if __name__ == '__main__':
+	unittest.main()
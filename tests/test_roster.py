@@ -0,0 +1,80 @@
+import config
+import gradebook
+from tests import course
+
+import csv
+import os
+import unittest
+import unittest.mock
+
+class RosterTest(unittest.TestCase):
+
+	def setUp(self):
+		course.make_course(self, students=5)
+		self.roster = gradebook.get_roster()
+
+	def test_find_by_id(self):
+		student = self.roster.all_students()[2]
+
+		self.assertIs(self.roster.find_by_id(student.student_id), student)
+		self.assertIsNone(self.roster.find_by_id('000000000'))
+
+	def test_find_by_pid_keeps_every_student(self):
+		first, second = self.roster.all_students()[:2]
+		row = second.to_row()
+		row[gradebook.Student.keys.index('Email')] = '{}@alumni.vt.edu'.format(first.pid)
+		self.roster.save_changes([gradebook.Student.from_row(row)])
+
+		self.assertEqual(
+			[s.student_id for s in self.roster.find_by_pid(first.pid)],
+			[first.student_id, second.student_id],
+		)
+		self.assertEqual(self.roster.find_by_pid('nobody'), [])
+
+	def test_status_lookup_follows_changes(self):
+		student = gradebook.Student.from_row(self.roster.all_students()[0].to_row())
+		student.status = 'Dropped'
+		self.roster.save_changes([student])
+
+		self.assertEqual(self.roster.with_status('Dropped'), [self.roster.find_by_id(student.student_id)])
+		self.assertNotIn(student.student_id, [s.student_id for s in self.roster.with_status('Active')])
+
+	def drop(self, students):
+		changed = []
+		for student in students:
+			row = student.to_row()
+			row[gradebook.Student.keys.index('Status')] = 'Dropped'
+			changed.append(gradebook.Student.from_row(row))
+
+		self.roster.save_changes(changed)
+
+	def read_statuses(self):
+		with open(config.ROSTER_PATH, 'r') as f:
+			return [row['Status'] for row in csv.DictReader(f)]
+
+	def test_changes_are_journaled_then_compacted(self):
+		journal_path = config.ROSTER_PATH + '.journal'
+		students = self.roster.all_students()
+
+		with unittest.mock.patch.object(gradebook, 'ROSTER_COMPACT_ENTRIES', 3):
+			self.drop(students[:2])
+			self.assertNotIn('Dropped', self.read_statuses())
+			self.assertTrue(os.path.exists(journal_path))
+
+			gradebook.invalidate_roster()
+			self.roster = gradebook.get_roster()
+			self.assertEqual(len(self.roster.with_status('Dropped')), 2)
+
+			compact_in_background = self.roster.journal.compact_in_background
+			def compact_and_wait(*arguments):
+				compact_in_background(*arguments).join()
+
+			with unittest.mock.patch.object(self.roster.journal, 'compact_in_background', side_effect=compact_and_wait) as compact:
+				self.drop(students[2:3])
+
+		self.assertEqual(compact.call_count, 1)
+		self.assertEqual(self.read_statuses()[:4], ['Dropped', 'Dropped', 'Dropped', 'Active'])
+		self.assertFalse(os.path.exists(journal_path))
+
+if __name__ == '__main__':
+	unittest.main()
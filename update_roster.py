@@ -4,120 +4,163 @@
 import config
 import csv
 import gradebook
+import profiling
 
-def add_parser(subparsers):
-	parser = subparsers.add_parser('update')
-	parser.add_argument('-missing', default='Dropped', help='How to mark students that are no longer listed.')
-	parser.set_defaults(func=update_roster)
+'''
+The roster fields that are copied from the HokieSpa roster when they change.
+'''
+UPDATED_FIELDS = ['First Name', 'Last Name', 'Email', 'Preferred Name', 'Year', 'Major']
 
 def update_roster(args):
 	'''
 	Compare the current students in the file with the available roster.
 	'''
-	updated_roster = load_hokiespa_roster()
-	current_roster = gradebook.get_all_students()
-	
-	inactive_students = find_newly_inactive_students(updated_roster, current_roster)
-	new_students = find_new_students(updated_roster, current_roster)
+	updated_roster, withdrawn_ids = load_hokiespa_roster()
+
+	# Work on copies, so the shared roster only changes once the update is saved
+	current_roster = [gradebook.Student.from_row(s.to_row()) for s in gradebook.get_all_students()]
+
+	diff = RosterDiff(updated_roster, current_roster, withdrawn_ids)
 
-	if (inactive_students or new_students) and confirm_update(inactive_students, new_students):
-		commit_update(current_roster, inactive_students, new_students, args.missing)
+	if diff and confirm_update(diff):
+		commit_update(diff, args.missing)
 		print('Changes saved to class roster.')
 	else:
 		print('No changes were applied to the roster.')
 
-def commit_update(current_roster, inactive_students, new_students, missing_status):
+class RosterDiff(object):
 	'''
-	Save the current roster to the file while changing the status of missing
-	students and adding in the new students as active.
+	The differences between the saved roster and the HokieSpa roster, found
+	with a single pass over each using maps keyed by student id:
+
+		added - students listed who are not in the roster
+		dropped - active students who are no longer listed
+		withdrawn - active students listed as having withdrawn
+		reactivated - students listed again after they became inactive
+		changed - (student, updated student, fields) of listed students
+		whose names, email, year or major changed
 	'''
-	# first, check for missings to change their status
-	for missing_student in inactive_students:
-		# Look for his entry in the current_roster
-		for student in current_roster:
-			if student.student_id == missing_student.student_id:
-				student.status = missing_status
-				break
-	
-	# add the other students
-	for student in new_students:
-		student.status = 'Active'
 
-		current_roster.append(student)
-	
-	# Save to the roster file
-	with open(config.ROSTER_PATH, 'w') as f:
-		writer = csv.DictWriter(f, fieldnames=gradebook.Student.keys)
-		writer.writeheader()
-		for student in current_roster:
-			writer.writerow(student.to_dictionary())
-
-def confirm_update(inactive_students, new_students):
+	def __init__(self, updated_roster, current_roster, withdrawn_ids=()):
+		current = {s.student_id: s for s in current_roster}
+		updated = {s.student_id: s for s in updated_roster}
+		withdrawn_ids = set(withdrawn_ids)
+
+		self.added = []
+		self.dropped = []
+		self.withdrawn = []
+		self.reactivated = []
+		self.changed = []
+
+		for student_id, new_student in updated.items():
+			old_student = current.get(student_id)
+			if old_student is None:
+				self.added.append(new_student)
+				continue
+
+			if old_student.status != 'Active':
+				self.reactivated.append(old_student)
+
+			fields = changed_fields(old_student, new_student)
+			if fields:
+				self.changed.append((old_student, new_student, fields))
+
+		for student_id, old_student in current.items():
+			if old_student.status != 'Active' or student_id in updated:
+				continue
+
+			if student_id in withdrawn_ids:
+				self.withdrawn.append(old_student)
+			else:
+				self.dropped.append(old_student)
+
+	def __bool__(self):
+		return any([self.added, self.dropped, self.withdrawn, self.reactivated, self.changed])
+
+def changed_fields(old_student, new_student):
 	'''
-	Check if the user really wants to commit these updates after listing all
-	changes that would be made.
+	The names of the updated fields that differ between two records of a
+	student.
 	'''
-	format_str = '{} {},{}'
-	if inactive_students:
-		print('{} students are now missing'.format(len(inactive_students)))
-		for student in inactive_students:
-			print(format_str.format(student.student_id, student.last_name, student.first_name))
-	
-	if new_students:
-		print('{} students to add'.format(len(new_students)))
-		for student in new_students:
-			print(format_str.format(student.student_id, student.last_name, student.first_name))
-	
-	response = input('Do you want to commit these changes? (Y/N) ').lower()
+	old_data = old_student.to_dictionary()
+	new_data = new_student.to_dictionary()
 
-	return response == 'y'
+	return [field for field in UPDATED_FIELDS if old_data[field] != new_data[field]]
 
-def find_newly_inactive_students(new, old):
+@profiling.timed('output write')
+def commit_update(diff, missing_status):
 	'''
-	Go through the roster and see which students were present and active in the
-	old roster, but are not listed in the new roster. Also add any students that
-	are now listed as withdrawn that were active.
-
-	returns - list of students that are now listed as inactive.
+	Save the changes to the roster: change the status of missing and
+	withdrawn students, reactivate returning students, copy changed fields and
+	add in the new students as active. Only the changed students are written,
+	to the roster's journal.
 	'''
+	for student in diff.dropped:
+		student.status = missing_status
+
+	for student in diff.withdrawn:
+		student.status = 'Withdrawn'
 
-	new_ids = [ s.student_id for s in new ]
+	for student in diff.reactivated:
+		student.status = 'Active'
 
-	inactive_students = []
+	# Take the changed fields by replacing the record, keeping its status
+	for old_student, new_student, _ in diff.changed:
+		new_student.status = old_student.status
 
-	# Check all the students we were tracking before
-	for old_student in old:
-		# check if they are now inactive and we thought they were active
-		if not old_student.student_id in new_ids and old_student.status == 'Active':
-			inactive_students.append(old_student)
-	
-	return inactive_students
+	# add the other students
+	for student in diff.added:
+		student.status = 'Active'
 
-def find_new_students(new, old):
-	'''
-	Go through the new roster and see if any students are not in the current
-	roster.
+	gradebook.get_roster().save_changes(
+		diff.dropped
+		+ diff.withdrawn
+		+ diff.reactivated
+		+ [new_student for _, new_student, _ in diff.changed]
+		+ diff.added
+	)
 
-	returns - list of new students
+	gradebook.invalidate_roster()
+
+def confirm_update(diff):
 	'''
-	# TODO Skipped dropped and withdraws
-	old_students = { s.student_id:s for s in old }
+	Check if the user really wants to commit these updates after listing all
+	changes that would be made.
+	'''
+	format_str = '{} {},{}'
+	sections = [
+		('{} students are now missing', diff.dropped),
+		('{} students have withdrawn', diff.withdrawn),
+		('{} students to reactivate', diff.reactivated),
+		('{} students to add', diff.added),
+	]
 
-	new_students = []
+	for title, students in sections:
+		if students:
+			print(title.format(len(students)))
+			for student in students:
+				print(format_str.format(student.student_id, student.last_name, student.first_name))
+
+	if diff.changed:
+		print('{} students have changed information'.format(len(diff.changed)))
+		for old_student, new_student, fields in diff.changed:
+			print(format_str.format(old_student.student_id, old_student.last_name, old_student.first_name))
+			old_data = old_student.to_dictionary()
+			new_data = new_student.to_dictionary()
+			for field in fields:
+				print('\t{}: "{}" -> "{}"'.format(field, old_data[field], new_data[field]))
 	
-	# Go through the new roster
-	for new_student in new:
-		# If someone is listed, but we aren't tracking them / their status
-		# isn't active
-		if (not new_student.student_id in old_students) or old_students[new_student.student_id].status != 'Active':
-			new_students.append(new_student)
+	response = input('Do you want to commit these changes? (Y/N) ').lower()
 
-	return new_students
+	return response == 'y'
 
 def load_hokiespa_roster():
 	'''
 	Take a loosely formatted HokieSpa roster and convert it to a list
 	of student dictionaries.
+
+	returns - a tuple of the listed students and the set of ids of the students
+	listed as having withdrawn from the course.
 	'''
 	print('Loading Roster')
 
@@ -138,14 +181,16 @@ def load_hokiespa_roster():
 		reader = csv.reader(hokiefile)
 
 		students = []
+		withdrawn_ids = set()
 
 		for student_row in reader:
 			student_data = {h: d.strip() for h,d in zip(implied_headers, student_row)}
 
-			# Ignore any student that is now withdrawn
+			# Set aside any student that is now withdrawn
 			if student_data['Grading'] == 'Course Withdrawal':
+				withdrawn_ids.add(student_data['Student ID'])
 				continue
 
 			students.append(gradebook.Student(student_data))
 	
-	return students
+	return students, withdrawn_ids